@@ -1,16 +1,57 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, abort, g, Response, make_response, has_request_context, before_render_template, template_rendered, message_flashed, get_flashed_messages, jsonify, send_file
 from flask_sqlalchemy import SQLAlchemy
-from flask_mail import Mail, Message
-from datetime import datetime
+from flask_sqlalchemy.session import Session as FlaskSQLAlchemySession
+from flask_mail import Mail, Message, Connection
+from datetime import datetime, timedelta
+from functools import wraps
 import re
 from itsdangerous import URLSafeTimedSerializer
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import generate_password_hash, check_password_hash, safe_join
 from flask_limiter import Limiter
 import logging
+import logging.handlers
 import os
 from dotenv import load_dotenv
 from flask_limiter.util import get_remote_address
 from redis import Redis
+from redis.exceptions import RedisError, ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
+from jinja2 import FileSystemBytecodeCache
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, DBAPIError
+from prometheus_client import Counter, Gauge, Histogram, CollectorRegistry, REGISTRY, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+import time
+import json
+import collections
+import hmac
+import signal
+import sys
+import queue
+import random
+import smtplib
+import threading
+import urllib.request
+import urllib.parse
+import mimetypes
+import click
+import gzip
+import hashlib
+import base64
+import zlib
+import posixpath
+import math
+import itertools
+import atexit
+import struct
+import mmap
+import heapq
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor
+from markupsafe import escape
 
 
 # Load environment variables from .env file
@@ -24,26 +65,613 @@ app.secret_key = os.environ.get('SECRET_KEY', 'default_secret_key')  # Use envir
 # Configure the database
 app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'your_databse_url')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Never wait on a dead database for long: bounded pool waits, and connect/read/write timeouts for PyMySQL
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'pool_pre_ping': True}
+if app.config['SQLALCHEMY_DATABASE_URI'].startswith('mysql'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_recycle'] = 280
+    app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_timeout'] = int(os.environ.get('DB_POOL_TIMEOUT', 5))
+    app.config['SQLALCHEMY_ENGINE_OPTIONS']['connect_args'] = {
+        'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 3)),
+        'read_timeout': int(os.environ.get('DB_READ_TIMEOUT', 15)),
+        'write_timeout': int(os.environ.get('DB_WRITE_TIMEOUT', 15)),
+    }
 app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
-app.config['MAIL_PORT'] = os.environ.get('MAIL_PORT', 1000)
-app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', True)
-app.config['MAIL_USE_SSL'] = os.environ.get('MAIL_USE_SSL', False)
+app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
+# Env values are strings, so parse them: "False" must not turn TLS on
+app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', 'true').lower() in ('1', 'true', 'yes')
+app.config['MAIL_USE_SSL'] = os.environ.get('MAIL_USE_SSL', '').lower() in ('1', 'true', 'yes')
 app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME', 'your_email@gmail.com')
 app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD', 'your_email_password')
 app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', 'your_email@gmail.com')
 
-db = SQLAlchemy(app)
+# Share compiled template bytecode between workers and restarts
+JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR')
+if JINJA_CACHE_DIR:
+    os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+
+# Background Threads
+# Threads do not survive gunicorn's fork, so every worker starts its own. Subsystems register
+# their loops with @background_thread; gunicorn's post_fork hook calls start_background_threads()
+# in each worker, and the first request does the same under the dev server. Code that needs one
+# of them outside a request (the log writer) starts it by name.
+background_threads = {}  # name -> (target, number of threads)
+background_thread_pids = {}  # name -> pid it was last started in
+background_threads_lock = threading.Lock()
+
+def background_thread(name, count=1):
+    """Register a function to run in count daemon threads in every worker."""
+    def decorator(target):
+        background_threads[name] = (target, count)
+        return target
+    return decorator
+
+def start_background_thread(name):
+    """Start a registered thread in this process unless it is already running here."""
+    pid = os.getpid()
+    if background_thread_pids.get(name) == pid:
+        return
+    with background_threads_lock:
+        if background_thread_pids.get(name) == pid:
+            return
+        background_thread_pids[name] = pid
+        target, count = background_threads[name]
+        for i in range(count):
+            threading.Thread(target=target, name=name if count == 1 else f"{name}-{i}", daemon=True).start()
+
+def start_background_threads():
+    for name in list(background_threads):
+        start_background_thread(name)
+
+@app.before_request
+def ensure_background_threads():
+    start_background_threads()
+
+# Read Replicas
+# With DATABASE_REPLICA_URLS set, plain reads go round-robin to the replicas that pass a periodic
+# health check. The primary still handles flushes, bulk INSERT/UPDATE/DELETE, sessions marked with
+# info['use_primary'], and every query in a request after that request has written. A browser
+# that just wrote carries a short-lived cookie, so the redirect after a form POST reads its own
+# write from the primary instead of a lagging replica. A read that fails on a replica is retried on
+# the primary, which then serves the rest of the request. With no replicas, everything uses the primary.
+REPLICA_URLS = [u.strip() for u in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if u.strip()]
+REPLICA_BINDS = [f"replica{i}" for i in range(len(REPLICA_URLS))]
+REPLICA_HEALTH_INTERVAL = float(os.environ.get('REPLICA_HEALTH_INTERVAL', 5))
+REPLICA_MAX_LAG = float(os.environ.get('REPLICA_MAX_LAG', 10))
+REPLICA_PIN_SECONDS = int(os.environ.get('REPLICA_PIN_SECONDS', 10))
+REPLICA_PIN_COOKIE = 'db_pin'
+app.config['SQLALCHEMY_BINDS'] = dict(zip(REPLICA_BINDS, REPLICA_URLS))
+REPLICA_HEALTHY = Gauge('db_replica_healthy', 'Whether a read replica is in rotation', ['replica'], multiprocess_mode='livemin')
+DB_ROUTED = Counter('db_session_routes_total', 'ORM statements by the engine they were routed to', ['target'])
+
+replica_health = {bind: True for bind in REPLICA_BINDS}
+replica_engines = {}  # engine -> bind name
+primary_engine = None
+replica_counter = itertools.count()
+
+def primary_pinned():
+    if not has_request_context():
+        return False
+    try:
+        return float(request.cookies.get(REPLICA_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+def next_replica():
+    """Pick the next healthy replica engine, or None when there is none."""
+    healthy = [bind for bind in REPLICA_BINDS if replica_health[bind]]
+    if not healthy:
+        return None
+    return db.engines[healthy[next(replica_counter) % len(healthy)]]
+
+def replica_lag(connection):
+    """Seconds the replica is behind its source, or None if we may not ask (needs REPLICATION CLIENT)."""
+    if connection.dialect.name != 'mysql':
+        return None
+    try:
+        row = connection.exec_driver_sql('SHOW REPLICA STATUS').mappings().first()
+    except Exception:
+        return None
+    return None if row is None else row.get('Seconds_Behind_Source')
+
+def set_replica_health(bind, healthy, reason=''):
+    if replica_health[bind] != healthy:
+        logging.warning('Read replica %s %s %s', bind, 'back in rotation' if healthy else 'taken out of rotation', reason)
+    replica_health[bind] = healthy
+    REPLICA_HEALTHY.labels(bind).set(int(healthy))
+
+def check_replicas_forever():
+    while True:
+        with app.app_context():
+            for bind in REPLICA_BINDS:
+                try:
+                    with db.engines[bind].connect() as connection:
+                        connection.exec_driver_sql('SELECT 1')
+                        lag = replica_lag(connection)
+                except Exception as e:
+                    set_replica_health(bind, False, f"({e})")
+                    continue
+                if lag is not None and lag > REPLICA_MAX_LAG:
+                    set_replica_health(bind, False, f"(lagging {lag}s)")
+                else:
+                    set_replica_health(bind, True)
+        time.sleep(REPLICA_HEALTH_INTERVAL)
+
+if REPLICA_BINDS:
+    background_thread('replica-health')(check_replicas_forever)
+
+class RoutingSession(FlaskSQLAlchemySession):
+    """Session that sends reads to a replica and everything else to the primary."""
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        primary = self._db.engines[None]
+        if bind is None and REPLICA_BINDS and engine is primary:
+            if self._flushing or self.info.get('use_primary') or self.info.get('wrote') \
+                    or getattr(clause, 'is_dml', False) or primary_pinned():
+                replica = None
+            else:
+                replica = next_replica()
+            DB_ROUTED.labels('replica' if replica is not None else 'primary').inc()
+            self.info['read_from_replica'] = replica is not None
+            engine = replica or engine
+        if engine is primary:
+            # Checked before the pool checkout, so an open breaker never waits out the connect timeout
+            db_breaker.before_call()
+        return engine
+
+@event.listens_for(RoutingSession, 'after_flush')
+def note_session_write(session, flush_context):
+    session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def note_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def retry_read_on_primary(orm_execute_state):
+    if not REPLICA_BINDS or not orm_execute_state.is_select:
+        return None
+    session = orm_execute_state.session
+    try:
+        return orm_execute_state.invoke_statement()
+    except DBAPIError as e:
+        if not session.info.get('read_from_replica') or not (e.connection_invalidated or isinstance(e, OperationalError)):
+            raise
+        logging.warning('Read replica failed mid-request, retrying on the primary: %s', e.orig)
+    # Reads only reach a replica before the session has written anything, so rolling back loses
+    # nothing and drops the dead replica connection from the transaction
+    session.rollback()
+    session.info['use_primary'] = True
+    DB_ROUTED.labels('primary_retry').inc()
+    return orm_execute_state.invoke_statement()
+
+@app.after_request
+def pin_writer_to_primary(response):
+    if REPLICA_BINDS and db.session.registry.has() and db.session.info.get('wrote'):
+        response.set_cookie(REPLICA_PIN_COOKIE, str(time.time() + REPLICA_PIN_SECONDS), max_age=REPLICA_PIN_SECONDS,
+                            httponly=True, samesite='Lax', secure=request.is_secure)
+    return response
+
+db = SQLAlchemy(app, session_options={'class_': RoutingSession})
+with app.app_context():
+    # Known up front, so a replica's errors can never count against the primary's breaker
+    primary_engine = db.engines[None]
+    replica_engines.update({db.engines[bind]: bind for bind in REPLICA_BINDS})
 mail = Mail(app)
 
+# Metrics
+# Under gunicorn, set PROMETHEUS_MULTIPROC_DIR to a shared directory so /metrics aggregates every worker
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Request latency by endpoint', ['endpoint', 'method', 'status'])
+REQUESTS_IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests currently being handled', multiprocess_mode='livesum')
+DB_QUERY_LATENCY = Histogram('db_query_duration_seconds', 'SQLAlchemy query latency', ['operation'],
+                             buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5))
+SMTP_SEND_LATENCY = Histogram('smtp_send_duration_seconds', 'Time spent sending an email')
+SMTP_SEND_FAILURES = Counter('smtp_send_failures_total', 'Emails that failed to send')
+RATE_LIMIT_REJECTIONS = Counter('rate_limit_rejections_total', 'Requests rejected by the rate limiter', ['endpoint'])
+REDIS_LATENCY = Histogram('redis_command_duration_seconds', 'Redis command latency', ['command'],
+                          buckets=(.0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .5))
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get('request_start')
+    if start is not None:
+        endpoint = request.url_rule.endpoint if request.url_rule else 'unmatched'
+        REQUEST_LATENCY.labels(endpoint, request.method, response.status_code).observe(time.perf_counter() - start)
+    return response
+
+@app.teardown_request
+def finish_request_timer(exc):
+    if g.get('request_start') is not None:
+        REQUESTS_IN_FLIGHT.dec()
+
+# Tracing
+# Sampled requests record nested spans and are exported as OTLP/JSON, either appended to
+# TRACE_EXPORT_PATH (one export request per line) or POSTed to an OTLP/HTTP collector.
+TRACE_SAMPLE_RATE = float(os.environ.get('TRACE_SAMPLE_RATE', 0))
+TRACE_EXPORT_PATH = os.environ.get('TRACE_EXPORT_PATH', 'traces.jsonl')
+TRACE_COLLECTOR_URL = os.environ.get('TRACE_COLLECTOR_URL')  # e.g. http://localhost:4318/v1/traces
+TRACE_QUEUE_SIZE = int(os.environ.get('TRACE_QUEUE_SIZE', 1000))
+SPAN_KIND_INTERNAL, SPAN_KIND_SERVER, SPAN_KIND_CLIENT = 1, 2, 3
+TRACEPARENT = re.compile(r'([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})')
+
+trace_queue = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+
+def start_span(name, kind=SPAN_KIND_INTERNAL, **attributes):
+    """Open a span under the current one; returns None when the request is not sampled."""
+    trace = g.get('trace') if has_request_context() else None
+    if trace is None:
+        return None
+    span = {
+        'traceId': trace['trace_id'],
+        'spanId': os.urandom(8).hex(),
+        'parentSpanId': trace['stack'][-1]['spanId'] if trace['stack'] else trace['parent_id'],
+        'name': name,
+        'kind': kind,
+        'startTimeUnixNano': time.time_ns(),
+        'attributes': [{'key': k, 'value': {'stringValue': str(v)}} for k, v in attributes.items()],
+    }
+    trace['stack'].append(span)
+    return span
+
+def end_span(span, error=None):
+    """Close a span returned by start_span."""
+    if span is None:
+        return
+    trace = g.trace
+    span['endTimeUnixNano'] = time.time_ns()
+    if error is not None:
+        span['status'] = {'code': 2, 'message': str(error)}
+    if span in trace['stack']:
+        trace['stack'].remove(span)
+    trace['spans'].append(span)
+
+def traced(name, kind=SPAN_KIND_INTERNAL):
+    """Decorator recording a span around each call of the wrapped function."""
+    def decorator(func):
+        @wraps(func)
+        def wrapped(*args, **kwargs):
+            span = start_span(name, kind)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                end_span(span, e)
+                raise
+            end_span(span)
+            return result
+        return wrapped
+    return decorator
+
+@background_thread('trace-exporter')
+def export_traces():
+    """Background writer draining finished traces to the file or collector."""
+    while True:
+        payload = trace_queue.get()
+        body = json.dumps(payload)
+        try:
+            if TRACE_COLLECTOR_URL:
+                req = urllib.request.Request(TRACE_COLLECTOR_URL, data=body.encode(),
+                                             headers={'Content-Type': 'application/json'})
+                urllib.request.urlopen(req, timeout=5).close()
+            else:
+                with open(TRACE_EXPORT_PATH, 'a') as f:
+                    f.write(body + '\n')
+        except Exception as e:
+            logging.warning('Trace export failed: %s', e)
+
+def enqueue_trace(spans):
+    """Hand a finished trace to this process's exporter thread, dropping it if the queue is full."""
+    payload = {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': 'sojt_app'}}]},
+        'scopeSpans': [{'scope': {'name': 'sojt_app'}, 'spans': spans}],
+    }]}
+    try:
+        trace_queue.put_nowait(payload)
+    except queue.Full:
+        pass
+
+def parse_traceparent(header):
+    """Return (trace ID, parent span ID, sampled) from a W3C traceparent header, or None if it is invalid."""
+    match = TRACEPARENT.fullmatch(header.strip())
+    if not match:
+        return None
+    version, trace_id, parent_id, flags = match.groups()
+    if version == 'ff' or trace_id == '0' * 32 or parent_id == '0' * 16:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+@app.before_request
+def start_request_trace():
+    # Follow the caller's W3C traceparent decision, otherwise sample at TRACE_SAMPLE_RATE
+    parent = parse_traceparent(request.headers.get('traceparent', ''))
+    if parent:
+        trace_id, parent_id, sampled = parent
+        if not sampled:
+            return
+    elif TRACE_SAMPLE_RATE and random.random() < TRACE_SAMPLE_RATE:
+        trace_id, parent_id = os.urandom(16).hex(), ''
+    else:
+        return
+    g.trace = {'trace_id': trace_id, 'parent_id': parent_id, 'stack': [], 'spans': []}
+    g.trace_root = start_span(f"{request.method} {request.path}", SPAN_KIND_SERVER,
+                              **{'http.method': request.method, 'http.target': request.path})
+
+@app.after_request
+def tag_request_trace(response):
+    root = g.get('trace_root')
+    if root is not None:
+        root['attributes'].append({'key': 'http.status_code', 'value': {'stringValue': str(response.status_code)}})
+        if request.url_rule:
+            root['name'] = f"{request.method} {request.url_rule.rule}"
+    return response
+
+@app.teardown_request
+def finish_request_trace(exc):
+    trace = g.get('trace')
+    if trace is None:
+        return
+    while trace['stack']:
+        end_span(trace['stack'][-1], exc)
+    g.trace = None
+    enqueue_trace(trace['spans'])
+
+@before_render_template.connect_via(app)
+def start_render_span(sender, template, context, **extra):
+    span = start_span(f"render_template {template.name}")
+    if span is not None:
+        g.setdefault('render_spans', []).append(span)
+
+@template_rendered.connect_via(app)
+def end_render_span(sender, template, context, **extra):
+    spans = g.get('render_spans') if has_request_context() else None
+    if spans:
+        end_span(spans.pop())
+
+# Circuit Breakers
+# Each dependency gets hard timeouts plus a breaker per worker process. After
+# BREAKER_FAILURE_THRESHOLD consecutive connection failures or timeouts the breaker opens and calls
+# fail at once instead of tying up the worker. After BREAKER_RESET_TIMEOUT one trial call goes
+# through (half-open): success closes the breaker, failure opens it again. The errors raised while
+# open subclass each client's own connection error, so existing handlers degrade as they do for a
+# real outage: Redis failures become cache misses, and SMTP failures get retried by the mail queue.
+# The database breaker is checked when the session picks an engine, before the pool checkout, so
+# an outage costs no connect timeouts once it is open.
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get('BREAKER_FAILURE_THRESHOLD', 5))
+BREAKER_RESET_TIMEOUT = float(os.environ.get('BREAKER_RESET_TIMEOUT', 30))
+REDIS_CONNECT_TIMEOUT = float(os.environ.get('REDIS_CONNECT_TIMEOUT', 1))
+REDIS_TIMEOUT = float(os.environ.get('REDIS_TIMEOUT', 2))
+MAIL_TIMEOUT = float(os.environ.get('MAIL_TIMEOUT', 10))
+CIRCUIT_STATE = Gauge('circuit_breaker_state', 'Breaker state (0 closed, 1 open, 2 half-open)', ['dependency'],
+                      multiprocess_mode='livemax')
+CIRCUIT_TRANSITIONS = Counter('circuit_breaker_transitions_total', 'Breaker state changes', ['dependency', 'state'])
+CIRCUIT_REJECTIONS = Counter('circuit_breaker_rejections_total', 'Calls failed fast by an open breaker', ['dependency'])
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+class RedisCircuitOpen(CircuitOpenError, RedisConnectionError):
+    pass
+
+class SMTPCircuitOpen(CircuitOpenError, smtplib.SMTPServerDisconnected):
+    pass
+
+class DatabaseCircuitOpen(CircuitOpenError):
+    pass
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open trial after a cool-down -> closed."""
+    CLOSED, OPEN, HALF_OPEN = 0, 1, 2
+    STATE_NAMES = {CLOSED: 'closed', OPEN: 'open', HALF_OPEN: 'half_open'}
+
+    def __init__(self, name, error_class, failure_threshold=BREAKER_FAILURE_THRESHOLD, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.error_class = error_class
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+        CIRCUIT_STATE.labels(name).set(self.CLOSED)
+
+    def _transition(self, state):
+        if state != self.state:
+            self.state = state
+            CIRCUIT_STATE.labels(self.name).set(state)
+            CIRCUIT_TRANSITIONS.labels(self.name, self.STATE_NAMES[state]).inc()
+            logging.warning('Circuit breaker for %s is now %s', self.name, self.STATE_NAMES[state])
+
+    def before_call(self):
+        """Raise error_class if the dependency should not be called right now."""
+        if self.state == self.CLOSED:
+            return
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            if time.time() - self.opened_at >= self.reset_timeout:
+                # Let this caller through as the trial; if it never reports back, another follows later
+                self.opened_at = time.time()
+                self._transition(self.HALF_OPEN)
+                return
+        CIRCUIT_REJECTIONS.labels(self.name).inc()
+        raise self.error_class(f"{self.name} circuit open")
+
+    def record_success(self):
+        # Any success breaks a run of failures, so only consecutive failures open the breaker
+        if self.state == self.CLOSED and not self.failures:
+            return
+        with self._lock:
+            self.failures = 0
+            self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+                self._transition(self.OPEN)
+
+redis_breaker = CircuitBreaker('redis', RedisCircuitOpen)
+smtp_breaker = CircuitBreaker('smtp', SMTPCircuitOpen)
+db_breaker = CircuitBreaker('database', DatabaseCircuitOpen)
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def close_database_breaker(conn, cursor, statement, parameters, context, executemany):
+    if conn.engine is primary_engine:
+        db_breaker.record_success()
+
+# MySQL client errors for a server that refused, dropped or timed out the connection: can't
+# connect (2003), server has gone away (2006) and lost connection during query (2013)
+CONNECTION_ERRNOS = {2003, 2006, 2013}
+
+def is_connection_failure(exception_context):
+    """Return True if a database error means the server is unreachable rather than the query failed."""
+    if exception_context.is_disconnect:
+        return True
+    if not isinstance(exception_context.sqlalchemy_exception, OperationalError):
+        return False
+    errno = exception_context.original_exception.args[0] if exception_context.original_exception.args else None
+    if isinstance(errno, int):
+        return errno in CONNECTION_ERRNOS
+    # Drivers without error numbers (SQLite) only count failures to open a connection at all
+    return exception_context.connection is None
+
+@event.listens_for(Engine, 'handle_error')
+def trip_database_breaker(exception_context):
+    # Only lost connections and timeouts count; deadlocks (1213), lock-wait timeouts (1205),
+    # constraint violations and bad SQL are the query's problem, not an outage
+    if is_connection_failure(exception_context):
+        if exception_context.engine in replica_engines:
+            # A failing replica leaves the rotation until the health check passes again
+            set_replica_health(replica_engines[exception_context.engine], False, f"({exception_context.original_exception})")
+        elif exception_context.engine is primary_engine:
+            db_breaker.record_failure()
+
+@app.errorhandler(CircuitOpenError)
+def dependency_unavailable(e):
+    """Tell the visitor to retry shortly instead of hanging or showing a 500."""
+    if request.method == 'POST':
+        flash('This service is temporarily unavailable. Please try again in a minute.', 'error')
+        return redirect(url_for('home'))
+    return Response('Service temporarily unavailable', status=503, mimetype='text/plain',
+                    headers={'Retry-After': str(int(BREAKER_RESET_TIMEOUT))})
+
+# Instrumentation shared by metrics and tracing
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    context.query_start = time.perf_counter()
+    context.query_span = start_span('sqlalchemy.execute', SPAN_KIND_CLIENT,
+                                    **{'db.system': conn.dialect.name, 'db.statement': statement[:500]})
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query_metrics(conn, cursor, statement, parameters, context, executemany):
+    operation = statement.split(None, 1)[0].upper() if statement else 'UNKNOWN'
+    DB_QUERY_LATENCY.labels(operation).observe(time.perf_counter() - context.query_start)
+    end_span(context.query_span)
+
+@event.listens_for(Engine, 'handle_error')
+def end_failed_query_span(exception_context):
+    if exception_context.execution_context is not None:
+        end_span(getattr(exception_context.execution_context, 'query_span', None), exception_context.original_exception)
+
+def record_rate_limit_breach(request_limit):
+    """Count requests the limiter turns away."""
+    RATE_LIMIT_REJECTIONS.labels(request.endpoint or 'unmatched').inc()
+
+class InstrumentedRedis(Redis):
+    """Redis client that records per-command latency and trace spans."""
+    def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        redis_breaker.before_call()
+        span = start_span(f"redis {command}", SPAN_KIND_CLIENT, **{'db.system': 'redis'})
+        start = time.perf_counter()
+        try:
+            result = super().execute_command(*args, **options)
+        except Exception as e:
+            if isinstance(e, (RedisConnectionError, RedisTimeoutError)):
+                redis_breaker.record_failure()
+            end_span(span, e)
+            raise
+        finally:
+            REDIS_LATENCY.labels(command).observe(time.perf_counter() - start)
+        end_span(span)
+        redis_breaker.record_success()
+        return result
+
+class TracedConnection(Connection):
+    """Flask-Mail connection with separate spans for the SMTP connect, TLS and login steps."""
+    def configure_host(self):
+        span = start_span('smtp.connect', SPAN_KIND_CLIENT, **{'net.peer.name': self.mail.server})
+        try:
+            if self.mail.use_ssl:
+                host = smtplib.SMTP_SSL(self.mail.server, self.mail.port, timeout=MAIL_TIMEOUT)
+            else:
+                host = smtplib.SMTP(self.mail.server, self.mail.port, timeout=MAIL_TIMEOUT)
+            host.set_debuglevel(int(self.mail.debug))
+            if self.mail.use_tls:
+                host.starttls()
+        except Exception as e:
+            end_span(span, e)
+            raise
+        end_span(span)
+        if self.mail.username and self.mail.password:
+            span = start_span('smtp.login', SPAN_KIND_CLIENT)
+            try:
+                host.login(self.mail.username, self.mail.password)
+            except Exception as e:
+                end_span(span, e)
+                host.close()
+                raise
+            end_span(span)
+        return host
+
+def send_email(msg):
+    """Send an email through Flask-Mail, recording latency, failures and trace spans."""
+    smtp_breaker.before_call()
+    start = time.perf_counter()
+    try:
+        with TracedConnection(mail.state) as connection:
+            span = start_span('smtp.send', SPAN_KIND_CLIENT)
+            try:
+                msg.send(connection)
+            except Exception as e:
+                end_span(span, e)
+                raise
+            end_span(span)
+    except Exception as e:
+        SMTP_SEND_FAILURES.inc()
+        # Unreachable or hung servers trip the breaker; rejected recipients and auth errors don't
+        if isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)) or \
+                (isinstance(e, OSError) and not isinstance(e, smtplib.SMTPException)):
+            smtp_breaker.record_failure()
+        raise
+    finally:
+        SMTP_SEND_LATENCY.observe(time.perf_counter() - start)
+    smtp_breaker.record_success()
+
 # Initialize Redis
-redis = Redis(host='localhost', port=6379, db=0)
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+redis = InstrumentedRedis.from_url(REDIS_URL, socket_connect_timeout=REDIS_CONNECT_TIMEOUT, socket_timeout=REDIS_TIMEOUT)
 
 email = os.getenv('EMAIL_ADDRESS')
 
+# Staff accounts allowed into the admin dashboard (comma-separated emails)
+admin_emails = {e.strip().lower() for e in os.environ.get('ADMIN_EMAILS', '').split(',') if e.strip()}
+
 # Initialize the Limiter with Redis storage
 limiter = Limiter(
     key_func=get_remote_address,
-    storage_uri='redis://localhost:6379'
+    storage_uri=os.environ.get('RATELIMIT_STORAGE_URI', REDIS_URL),
+    storage_options={'socket_connect_timeout': REDIS_CONNECT_TIMEOUT, 'socket_timeout': REDIS_TIMEOUT},
+    # If Redis goes away, keep limiting per worker in memory rather than failing every request
+    swallow_errors=True,
+    in_memory_fallback_enabled=True,
+    on_breach=record_rate_limit_breach
 )
 limiter.init_app(app)
 
@@ -51,8 +679,718 @@ limiter.init_app(app)
 # Initialize the URLSafeTimedSerializer
 s = URLSafeTimedSerializer(app.secret_key)
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Logging
+# Log calls render the message and enqueue the record; a background thread formats and writes it,
+# so a slow disk or log pipe never stalls a request. When the queue is full, records are dropped
+# and counted rather than blocking. Records carry the request's ID (taken from X-Request-ID or
+# generated on first use, and echoed back) and are written as one JSON object per line. Every
+# request ends with an access record on the 'access' logger unless LOG_ACCESS is off.
+# LOG_SAMPLE_RATE keeps that share of requests' INFO-and-below records, chosen per request so a
+# sampled request logs completely; warnings and errors are always kept.
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')  # json or text
+LOG_SAMPLE_RATE = float(os.environ.get('LOG_SAMPLE_RATE', 1.0))
+LOG_ACCESS = os.environ.get('LOG_ACCESS', 'true').lower() in ('1', 'true', 'yes')
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_RECORDS_DROPPED = Counter('log_records_dropped_total', 'Log records dropped because the log queue was full')
+REQUEST_ID_PATTERN = re.compile(r'[A-Za-z0-9._-]{1,64}')
+ACCESS_LOG_FIELDS = ('method', 'path', 'status', 'duration_ms')
+
+log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with the request ID and trace ID when there are any."""
+    def format(self, record):
+        entry = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'pid': record.process,
+        }
+        if getattr(record, 'trace_id', None):
+            entry['trace_id'] = record.trace_id
+        for field in ACCESS_LOG_FIELDS:
+            if hasattr(record, field):
+                entry[field] = getattr(record, field)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+def current_request_id():
+    """The request's ID, assigned on first use so records from hooks that run before assign_request_id carry it."""
+    if 'request_id' not in g:
+        incoming = request.headers.get('X-Request-ID', '')
+        g.request_id = incoming if REQUEST_ID_PATTERN.fullmatch(incoming) else os.urandom(8).hex()
+        g.log_sampled = LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE
+    return g.request_id
+
+class RequestContextFilter(logging.Filter):
+    """Tag records with the request ID and apply sampling; runs in the logging thread's caller."""
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = current_request_id()
+            trace = g.get('trace')
+            record.trace_id = trace['trace_id'] if trace else None
+            sampled = g.get('log_sampled', True)
+        else:
+            record.request_id = record.trace_id = None
+            sampled = LOG_SAMPLE_RATE >= 1 or random.random() < LOG_SAMPLE_RATE
+        return sampled or record.levelno >= logging.WARNING
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks and leaves JSON formatting to the writer thread."""
+    def prepare(self, record):
+        # Render the message now, on the caller's thread: its args may change once the call returns
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            # Render tracebacks now; the frames they point at won't wait for the writer
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        # Logging starts long before the first request, and in CLI commands that never serve one
+        start_background_thread('log-writer')
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+log_output = logging.StreamHandler(sys.stderr)
+log_output.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else
+                        logging.Formatter('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s'))
+
+@background_thread('log-writer')
+def write_logs():
+    while True:
+        log_output.handle(log_queue.get())
+
+@atexit.register
+def flush_logs():
+    """Write whatever is still queued when the process exits."""
+    while True:
+        try:
+            log_output.handle(log_queue.get_nowait())
+        except queue.Empty:
+            return
+
+log_handler = DroppingQueueHandler(log_queue)
+log_handler.addFilter(RequestContextFilter())
+logging.basicConfig(level=LOG_LEVEL, handlers=[log_handler], force=True)
+
+@app.before_request
+def assign_request_id():
+    current_request_id()
+
+@app.after_request
+def echo_request_id(response):
+    if g.get('request_id'):
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+@app.after_request
+def log_request(response):
+    """Write one access record per request with its method, path, status and duration."""
+    start = g.get('request_start')
+    if LOG_ACCESS and start is not None:
+        duration_ms = round((time.perf_counter() - start) * 1000, 1)
+        # The route pattern, not the path: /reset/<token> and friends carry credentials
+        path = request.url_rule.rule if request.url_rule else request.path
+        logging.getLogger('access').info('%s %s %s %sms', request.method, path, response.status_code, duration_ms,
+                                         extra={'method': request.method, 'path': path,
+                                                'status': response.status_code, 'duration_ms': duration_ms})
+    return response
+
+# Caching
+# Two tiers: a bounded in-process LRU with per-entry TTLs in front of the shared Redis. Entries
+# remember how long they took to compute, so get_or_compute can refresh hot keys a little before
+# they expire (probabilistic early refresh), and concurrent misses for one key are coalesced: one
+# thread per process, and one process via a short Redis lock, computes while the rest wait or keep
+# serving the previous value.
+#
+# Every worker on every host subscribes to CACHE_INVALIDATION_CHANNEL. Deleting a key publishes it
+# and each subscriber evicts it from its local tier. Keys are namespaced by their first part (the
+# tag) and that tag's version from CACHE_VERSIONS_KEY, so `flask invalidate-cache view`
+# abandons every rendered page at once. Pub/sub delivers at most once: after (re)subscribing a
+# worker re-reads the versions and clears its local tier, and it re-reads them periodically in
+# case a bump was stored but never announced.
+CACHE_LOCAL_SIZE = int(os.environ.get('CACHE_LOCAL_SIZE', 1024))
+CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 300))
+CACHE_EARLY_REFRESH_BETA = float(os.environ.get('CACHE_EARLY_REFRESH_BETA', 1.0))
+CACHE_LOCK_TIMEOUT = float(os.environ.get('CACHE_LOCK_TIMEOUT', 5))
+CACHE_PREFIX = 'cache:'
+CACHE_INVALIDATION_CHANNEL = 'cache:invalidate'
+CACHE_VERSIONS_KEY = 'cache:versions'
+CACHE_VERSION_CHECK_INTERVAL = int(os.environ.get('CACHE_VERSION_CHECK_INTERVAL', 30))
+CACHE_EVENTS = Counter('cache_events_total', 'Cache hits, misses and evictions by tier', ['tier', 'event'])
+CACHE_INVALIDATIONS = Counter('cache_invalidations_total', 'Invalidations applied to the local tier by kind', ['kind'])
+
+class CacheEntry:
+    __slots__ = ('value', 'expires_at', 'delta')
+
+    def __init__(self, value, expires_at, delta=0.0):
+        self.value = value
+        self.expires_at = expires_at
+        self.delta = delta
+
+class LocalCache:
+    """Bounded in-process LRU cache with per-entry TTLs."""
+    def __init__(self, max_size, name='local'):
+        self.max_size = max_size
+        self.name = name
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.time():
+                del self._entries[key]
+                entry = None
+                CACHE_EVENTS.labels(self.name, 'expired').inc()
+            if entry is None:
+                CACHE_EVENTS.labels(self.name, 'miss').inc()
+                return None
+            self._entries.move_to_end(key)
+        CACHE_EVENTS.labels(self.name, 'hit').inc()
+        return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                CACHE_EVENTS.labels(self.name, 'eviction').inc()
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def encode_cache_value(value):
+    """JSON fallback for cached values: bytes (rendered pages) travel as tagged base64."""
+    if isinstance(value, bytes):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f"{type(value).__name__} is not cacheable in Redis")
+
+def decode_cache_value(obj):
+    return base64.b64decode(obj['__bytes__']) if obj.keys() == {'__bytes__'} else obj
+
+class RedisCache:
+    """Cache tier over the shared Redis client. Errors count as misses so an outage only costs speed.
+
+    Entries are stored as JSON, never pickled, so a write to Redis cannot become code execution here.
+    """
+    name = 'redis'
+
+    def get(self, key):
+        try:
+            data = redis.get(CACHE_PREFIX + key)
+        except RedisError as e:
+            logging.warning('Redis cache read failed: %s', e)
+            return None
+        if data is None:
+            CACHE_EVENTS.labels(self.name, 'miss').inc()
+            return None
+        try:
+            value, expires_at, delta = json.loads(data, object_hook=decode_cache_value)
+        except (ValueError, TypeError) as e:
+            logging.warning('Unreadable Redis cache entry %s: %s', key, e)
+            return None
+        CACHE_EVENTS.labels(self.name, 'hit').inc()
+        return CacheEntry(value, expires_at, delta)
+
+    def set(self, key, entry):
+        ttl = math.ceil(entry.expires_at - time.time())
+        if ttl <= 0:
+            return
+        try:
+            data = json.dumps([entry.value, entry.expires_at, entry.delta], default=encode_cache_value)
+        except (TypeError, ValueError) as e:
+            logging.warning('Skipping Redis cache write for %s: %s', key, e)
+            return
+        try:
+            redis.set(CACHE_PREFIX + key, data, ex=ttl)
+        except RedisError as e:
+            logging.warning('Redis cache write failed: %s', e)
+
+    def delete(self, key):
+        try:
+            redis.delete(CACHE_PREFIX + key)
+        except RedisError as e:
+            logging.warning('Redis cache delete failed: %s', e)
+
+    def acquire(self, key, timeout):
+        """Take the short-lived compute lock for a key; True if Redis is unreachable."""
+        try:
+            return bool(redis.set(f"{CACHE_PREFIX}lock:{key}", os.getpid(), nx=True, px=int(timeout * 1000)))
+        except RedisError:
+            return True
+
+    def release(self, key):
+        try:
+            redis.delete(f"{CACHE_PREFIX}lock:{key}")
+        except RedisError:
+            pass
+
+class InvalidationBus:
+    """Broadcasts cache invalidations over Redis pub/sub and applies them to this process's local tier.
+
+    Key invalidations evict one key everywhere. Tag invalidations bump the tag's namespace version
+    in Redis, which cache_key() puts in every key, so a whole family of entries is abandoned at
+    once in both tiers.
+    """
+    def __init__(self, local, channel=CACHE_INVALIDATION_CHANNEL):
+        self.local = local
+        self.channel = channel
+        self.versions = {}
+        self.connected = False
+        self._lock = threading.Lock()
+
+    def version(self, tag):
+        """Return the current namespace version for a tag, reading it from Redis on first use."""
+        version = self.versions.get(tag)
+        if version is None:
+            try:
+                version = int(redis.hget(CACHE_VERSIONS_KEY, tag) or 0)
+            except RedisError as e:
+                logging.warning('Could not read cache version for %s: %s', tag, e)
+                return 0
+            self.merge_versions({tag: version})
+            version = self.versions[tag]
+        return version
+
+    def merge_versions(self, versions):
+        # Versions only move forward, whatever order the bump and the re-read arrive in
+        with self._lock:
+            for tag, version in versions.items():
+                self.versions[tag] = max(self.versions.get(tag, 0), int(version))
+
+    def publish_keys(self, keys):
+        try:
+            redis.publish(self.channel, json.dumps({'keys': list(keys)}))
+        except RedisError as e:
+            logging.warning('Could not publish cache invalidation: %s', e)
+
+    def bump(self, tag):
+        """Move a tag to a new namespace version on every node; returns the new version."""
+        version = redis.hincrby(CACHE_VERSIONS_KEY, tag, 1)
+        self.merge_versions({tag: version})
+        try:
+            redis.publish(self.channel, json.dumps({'tag': tag, 'version': version}))
+        except RedisError as e:
+            # The new version is already in Redis; other workers pick it up at their next check
+            logging.warning('Could not publish cache invalidation for tag %s: %s', tag, e)
+        return version
+
+    def apply(self, message):
+        for key in message.get('keys', ()):
+            self.local.delete(key)
+            CACHE_INVALIDATIONS.labels('key').inc()
+        if 'tag' in message:
+            self.merge_versions({message['tag']: message['version']})
+            CACHE_INVALIDATIONS.labels('tag').inc()
+
+    def resync(self):
+        """Catch up after (re)subscribing: re-read every version and drop local entries we may have missed evictions for."""
+        self.merge_versions({tag.decode(): version for tag, version in redis.hgetall(CACHE_VERSIONS_KEY).items()})
+        self.local.clear()
+        CACHE_INVALIDATIONS.labels('resync').inc()
+
+    def listen_forever(self):
+        delay = 1
+        while True:
+            pubsub = redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.channel)
+                self.resync()
+                self.connected, delay = True, 1
+                next_check = time.time() + CACHE_VERSION_CHECK_INTERVAL
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        try:
+                            self.apply(json.loads(message['data']))
+                        except (ValueError, KeyError, TypeError) as e:
+                            logging.warning('Ignoring malformed cache invalidation: %s', e)
+                    if time.time() >= next_check:
+                        # Backstop for bumps whose publish failed
+                        self.merge_versions({tag.decode(): v for tag, v in redis.hgetall(CACHE_VERSIONS_KEY).items()})
+                        next_check = time.time() + CACHE_VERSION_CHECK_INTERVAL
+            except RedisError as e:
+                logging.warning('Cache invalidation bus disconnected, retrying in %ss: %s', delay, e)
+            finally:
+                self.connected = False
+                pubsub.close()
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+class TieredCache:
+    """Local LRU in front of Redis, with stampede protection in get_or_compute.
+
+    Pass local=False for values that must never be served stale, even for the moment an
+    invalidation takes to reach other workers.
+    """
+    def __init__(self, local, remote, bus):
+        self.local = local
+        self.remote = remote
+        self.bus = bus
+        self._computing = {}  # key -> Event set when this process's computation of it finishes
+        self._computing_lock = threading.Lock()
+
+    def _entry(self, key, remote=True, local=True):
+        entry = self.local.get(key) if local else None
+        if entry is None and remote:
+            entry = self.remote.get(key)
+            if entry is not None and local:
+                self.local.set(key, entry)
+        return entry
+
+    def get(self, key, default=None, remote=True, local=True):
+        entry = self._entry(key, remote, local)
+        return default if entry is None else entry.value
+
+    def set(self, key, value, ttl=CACHE_DEFAULT_TTL, remote=True, local=True, delta=0.0):
+        entry = CacheEntry(value, time.time() + ttl, delta)
+        if local:
+            self.local.set(key, entry)
+        if remote:
+            self.remote.set(key, entry)
+
+    def delete(self, key):
+        self.local.delete(key)
+        self.remote.delete(key)
+        self.bus.publish_keys([key])
+
+    def invalidate_tag(self, tag):
+        """Abandon every entry whose key starts with tag, on every node."""
+        return self.bus.bump(tag)
+
+    def _refresh_early(self, entry):
+        # XFetch: recompute with rising probability as expiry nears, scaled by compute cost
+        return time.time() - entry.delta * CACHE_EARLY_REFRESH_BETA * math.log(random.random() or 1e-12) >= entry.expires_at
+
+    def get_or_compute(self, key, compute, ttl=CACHE_DEFAULT_TTL, remote=True, local=True, should_cache=None):
+        """Return the cached value for key, computing and storing it once on a miss.
+
+        ttl may be a callable taking the computed value, e.g. to cache misses for less time.
+        """
+        entry = self._entry(key, remote, local)
+        if entry is not None and not self._refresh_early(entry):
+            return entry.value
+        # One thread per key computes in this process; waiters block on that key alone
+        with self._computing_lock:
+            done = self._computing.get(key)
+            if done is None:
+                done = self._computing[key] = threading.Event()
+                leader = True
+            else:
+                leader = False
+        if not leader:
+            if entry is not None:
+                return entry.value  # another thread is refreshing; serve what we have
+            done.wait(CACHE_LOCK_TIMEOUT)
+            fresh = self._entry(key, remote, local)
+            return fresh.value if fresh is not None else compute()
+        try:
+            return self._compute(key, compute, entry, ttl, remote, local, should_cache)
+        finally:
+            with self._computing_lock:
+                del self._computing[key]
+            done.set()
+
+    def _compute(self, key, compute, entry, ttl, remote, local, should_cache):
+        fresh = self._entry(key, remote, local)
+        if fresh is not None and fresh is not entry:
+            return fresh.value
+        locked = not remote or self.remote.acquire(key, CACHE_LOCK_TIMEOUT)
+        if not locked:
+            if entry is not None:
+                return entry.value  # another process is refreshing; serve what we have
+            deadline = time.time() + CACHE_LOCK_TIMEOUT
+            while time.time() < deadline:
+                time.sleep(0.05)
+                fresh = self.remote.get(key)
+                if fresh is not None:
+                    if local:
+                        self.local.set(key, fresh)
+                    return fresh.value
+        try:
+            start = time.perf_counter()
+            value = compute()
+            if should_cache is None or should_cache(value):
+                self.set(key, value, ttl(value) if callable(ttl) else ttl, remote, local, time.perf_counter() - start)
+            return value
+        finally:
+            if locked and remote:
+                self.remote.release(key)
+
+local_cache = LocalCache(CACHE_LOCAL_SIZE)
+cache = TieredCache(local_cache, RedisCache(), InvalidationBus(local_cache))
+
+@background_thread('cache-invalidation')
+def listen_for_invalidations():
+    cache.bus.listen_forever()
+
+def cache_key(tag, *parts):
+    """Join key parts under the tag's current version, hashing long keys so they stay cheap to store and compare."""
+    key = ':'.join(str(part) for part in parts)
+    if len(key) > 200:
+        key = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    return f"{tag}:v{cache.bus.version(tag)}:{key}"
+
+def cached_view(ttl=CACHE_DEFAULT_TTL, query_args=()):
+    """Cache a GET view's rendered body per path, skipping responses that touched the session.
+
+    Only the query parameters named in query_args are part of the key, so arbitrary query strings
+    cannot fill the cache; views that read any other parameter must not use this decorator.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(*args, **kwargs):
+            if request.method != 'GET':
+                return view(*args, **kwargs)
+
+            def render():
+                response = make_response(view(*args, **kwargs))
+                cacheable = response.status_code == 200 and not session.accessed and not response.is_streamed
+                return response.get_data() if cacheable else response, response.mimetype
+
+            args = sorted((name, request.args.getlist(name)) for name in query_args if name in request.args)
+            body, mimetype = cache.get_or_compute(cache_key('view', request.path, *args), render, ttl,
+                                                  should_cache=lambda result: isinstance(result[0], bytes))
+            return Response(body, mimetype=mimetype) if isinstance(body, bytes) else body
+        return wrapped
+    return decorator
+
+@app.cli.command('invalidate-cache')
+@click.argument('tags', nargs=-1, required=True)
+def invalidate_cache(tags):
+    """Abandon every cached entry under the given tags on all nodes, e.g. `view` after a deploy."""
+    for tag in tags:
+        click.echo(f"{tag}: now version {cache.invalidate_tag(tag)}")
+
+# Email Delivery
+# Routes queue mail instead of talking SMTP in the request. Each message goes on a Redis list for
+# its priority class; delivery threads (one per web worker by default, or `flask mail-worker`
+# processes) always take from the most urgent non-empty list, then wait on two token buckets, one
+# for the SMTP provider and one for the sender address, before sending. The buckets and the
+# provider's daily quota are shared in Redis, so every worker together stays under the provider's
+# limits and bursts queue up instead of failing. Temporary SMTP errors are retried with backoff;
+# messages that hit the daily quota wait for the next day, and sends that never went out are given
+# back to the quota. Queued messages are stored as JSON of their plain fields, never pickled.
+MAIL_DELIVERY = os.environ.get('MAIL_DELIVERY', 'thread')  # thread, worker (external only) or sync
+MAIL_PRIORITIES = ('high', 'normal', 'low')  # account mail, staff notifications, thank-yous
+MAIL_OUTBOX_KEY = 'mail:outbox:'
+MAIL_DELAYED_KEY = 'mail:delayed'
+MAIL_DEAD_KEY = 'mail:dead'
+MAIL_MAX_ATTEMPTS = int(os.environ.get('MAIL_MAX_ATTEMPTS', 5))
+MAIL_RETRY_DELAY = float(os.environ.get('MAIL_RETRY_DELAY', 30))
+MAIL_WORKER_THREADS = int(os.environ.get('MAIL_WORKER_THREADS', 1))
+# Known provider limits: server -> (messages per minute, burst, messages per day)
+MAIL_PROVIDER_LIMITS = {
+    'smtp.gmail.com': (20, 10, 2000),
+    'smtp.office365.com': (30, 10, 10000),
+}
+MAIL_DEFAULT_LIMITS = (60, 20, 0)  # 0 means no daily quota
+MAIL_SENDER_RATE_PER_MINUTE = float(os.environ.get('MAIL_SENDER_RATE_PER_MINUTE', 20))
+MAIL_SENDER_BURST = int(os.environ.get('MAIL_SENDER_BURST', 10))
+MAIL_QUEUED = Counter('mail_queued_total', 'Emails queued for delivery', ['priority'])
+MAIL_DEFERRED = Counter('mail_deferred_total', 'Emails put back for later delivery', ['reason'])
+MAIL_DEAD = Counter('mail_dead_letters_total', 'Emails given up on')
+MAIL_THROTTLE_WAIT = Histogram('mail_throttle_wait_seconds', 'Time spent waiting on send token buckets',
+                               buckets=(0, .1, .5, 1, 2.5, 5, 10, 30, 60))
+
+# Take one token from every bucket, or none; returns the seconds to wait when any is empty
+TAKE_TOKENS_SCRIPT = """
+local now = tonumber(ARGV[1])
+local wait = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local rate, burst = tonumber(ARGV[i * 2]), tonumber(ARGV[i * 2 + 1])
+    local state = redis.call('hmget', key, 'tokens', 'ts')
+    local tokens = math.min(burst, (tonumber(state[1]) or burst) + (now - (tonumber(state[2]) or now)) * rate)
+    levels[i] = tokens
+    if tokens < 1 then wait = math.max(wait, (1 - tokens) / rate) end
+end
+for i, key in ipairs(KEYS) do
+    local rate, burst = tonumber(ARGV[i * 2]), tonumber(ARGV[i * 2 + 1])
+    local tokens = levels[i]
+    if wait == 0 then tokens = tokens - 1 end
+    redis.call('hset', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('expire', key, math.ceil(burst / rate) + 60)
+end
+return tostring(wait)
+"""
+
+def provider_limits():
+    """(per minute, burst, per day) for MAIL_SERVER, overridable through the environment."""
+    per_minute, burst, per_day = MAIL_PROVIDER_LIMITS.get(app.config['MAIL_SERVER'], MAIL_DEFAULT_LIMITS)
+    return (float(os.environ.get('MAIL_RATE_PER_MINUTE', per_minute)), int(os.environ.get('MAIL_BURST', burst)),
+            int(os.environ.get('MAIL_DAILY_QUOTA', per_day)))
+
+MESSAGE_FIELDS = ('subject', 'recipients', 'body', 'html', 'sender', 'cc', 'bcc', 'reply_to', 'extra_headers')
+
+def message_fields(msg):
+    """The parts of a Message the queue keeps; attachments are not supported."""
+    return {field: getattr(msg, field) for field in MESSAGE_FIELDS}
+
+def message_from_fields(fields):
+    sender = fields.get('sender')
+    return Message(**dict(fields, sender=tuple(sender) if isinstance(sender, list) else sender))
+
+def queue_email(msg, priority='normal'):
+    """Queue a message for throttled delivery; sends inline when queueing is off or Redis is down."""
+    if MAIL_DELIVERY == 'sync':
+        return send_email(msg)
+    job = {'msg': message_fields(msg), 'priority': priority, 'attempts': 0}
+    try:
+        redis.rpush(MAIL_OUTBOX_KEY + priority, json.dumps(job))
+    except RedisError as e:
+        logging.warning('Mail queue unavailable, sending inline: %s', e)
+        try:
+            send_email(msg)
+        except Exception as e:
+            logging.error('Failed to send email to %s: %s', msg.recipients, e)
+        return
+    MAIL_QUEUED.labels(priority).inc()
+
+def defer_email(job, delay, reason):
+    MAIL_DEFERRED.labels(reason).inc()
+    redis.zadd(MAIL_DELAYED_KEY, {json.dumps(job): time.time() + delay})
+
+def release_delayed_mail():
+    """Move delayed messages that are due back onto their outbox lists."""
+    for member in redis.zrangebyscore(MAIL_DELAYED_KEY, '-inf', time.time(), start=0, num=100):
+        if redis.zrem(MAIL_DELAYED_KEY, member):  # only one worker wins each message
+            redis.rpush(MAIL_OUTBOX_KEY + json.loads(member)['priority'], member)
+
+def take_send_tokens(sender):
+    """Try to take a provider and a sender token; returns 0 on success, else seconds to wait."""
+    per_minute, burst, per_day = provider_limits()
+    provider = app.config['MAIL_SERVER']
+    return float(redis.eval(TAKE_TOKENS_SCRIPT, 2, f"mail:bucket:provider:{provider}", f"mail:bucket:sender:{sender}",
+                            time.time(), per_minute / 60, burst, MAIL_SENDER_RATE_PER_MINUTE / 60, MAIL_SENDER_BURST))
+
+def daily_quota_key():
+    """Today's send counter for the provider, or None when it has no daily quota."""
+    if not provider_limits()[2]:
+        return None
+    return f"mail:quota:{app.config['MAIL_SERVER']}:{time.strftime('%Y%m%d', time.gmtime())}"
+
+def take_daily_quota(key):
+    """Count one send against the daily quota counter at key; returns False once it is used up."""
+    if key is None:
+        return True
+    used = redis.incr(key)
+    if used == 1:
+        redis.expire(key, 2 * 86400)
+    if used > provider_limits()[2]:
+        redis.decr(key)
+        return False
+    return True
+
+def refund_daily_quota(key):
+    """Give back a send that was counted against the quota but not delivered."""
+    if key is not None:
+        redis.decr(key)
+
+def seconds_until_tomorrow():
+    return 86400 - time.time() % 86400  # quotas reset at midnight UTC
+
+def is_quota_error(error):
+    # Gmail answers 550 5.4.5 once the daily limit is reached; 421/450/451/452 are temporary
+    return isinstance(error, smtplib.SMTPResponseException) and (
+        error.smtp_code == 550 and b'5.4.5' in (error.smtp_error or b''))
+
+def is_temporary_error(error):
+    # SMTPException subclasses OSError, so every SMTP error must be classified before the fallback
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and all(400 <= code < 500 for code in codes)
+    if isinstance(error, smtplib.SMTPResponseException):  # sender refused, data, connect, helo, auth
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        return False  # protocol or configuration errors: retrying sends the same thing again
+    return isinstance(error, OSError)  # socket errors and timeouts
+
+def deliver_next_email(timeout=1):
+    """Deliver the most urgent queued message; returns False when the outbox was empty."""
+    release_delayed_mail()
+    popped = redis.blpop([MAIL_OUTBOX_KEY + p for p in MAIL_PRIORITIES], timeout=timeout)
+    if popped is None:
+        return False
+    key, data = popped
+    try:
+        job = json.loads(data)
+        msg = message_from_fields(job['msg'])
+    except (ValueError, TypeError, KeyError) as e:
+        MAIL_DEAD.inc()
+        redis.rpush(MAIL_DEAD_KEY, data)
+        logging.error('Unreadable queued email moved to %s: %s', MAIL_DEAD_KEY, e)
+        return True
+    wait = take_send_tokens(msg.sender)
+    if wait:
+        # Put it back at the head of its list so it keeps its place, and let the bucket refill
+        redis.lpush(key, data)
+        MAIL_THROTTLE_WAIT.observe(wait)
+        time.sleep(min(wait, 5))
+        return True
+    quota = daily_quota_key()
+    if not take_daily_quota(quota):
+        defer_email(job, seconds_until_tomorrow(), 'quota')
+        return True
+    try:
+        with app.app_context():
+            send_email(msg)
+    except SMTPCircuitOpen:
+        refund_daily_quota(quota)
+        defer_email(job, smtp_breaker.reset_timeout, 'circuit')  # not the message's fault; keep its attempts
+    except Exception as e:
+        refund_daily_quota(quota)
+        job['attempts'] += 1
+        if is_quota_error(e):
+            defer_email(job, seconds_until_tomorrow(), 'quota')
+        elif is_temporary_error(e) and job['attempts'] < MAIL_MAX_ATTEMPTS:
+            defer_email(job, MAIL_RETRY_DELAY * 2 ** (job['attempts'] - 1), 'retry')
+        else:
+            MAIL_DEAD.inc()
+            redis.rpush(MAIL_DEAD_KEY, json.dumps(job))
+            logging.error('Giving up on email to %s after %d attempts: %s', msg.recipients, job['attempts'], e)
+    return True
+
+def deliver_mail_forever(stopping=None):
+    """Delivery loop for the background threads and `flask mail-worker`."""
+    while stopping is None or not stopping.is_set():
+        try:
+            deliver_next_email()
+        except RedisError as e:
+            logging.warning('Mail delivery could not reach Redis: %s', e)
+            time.sleep(5)
+        except Exception as e:
+            logging.exception('Mail delivery failed: %s', e)
+            time.sleep(1)
+
+@app.cli.command('mail-worker')
+def mail_worker_command():
+    """Deliver queued email until stopped (use with MAIL_DELIVERY=worker on the web workers)."""
+    stopping = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stopping.set())
+    click.echo(f"Delivering mail via {app.config['MAIL_SERVER']} at {provider_limits()[0]:g}/min")
+    deliver_mail_forever(stopping)
+
+if MAIL_DELIVERY == 'thread':
+    background_thread('mail-delivery', MAIL_WORKER_THREADS)(deliver_mail_forever)
 
 # Database model for subscriptions
 class Subscription(db.Model):
@@ -65,40 +1403,233 @@ class User(db.Model):
     email = db.Column(db.String(100), unique=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)
     is_verified = db.Column(db.Boolean, default=False)  # To track email verification
+    created_at = db.Column(db.DateTime, default=db.func.now(), index=True)  # Lets housekeeping purge stale signups
 
 # Database model for scheduled calls
 class ScheduledCall(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
-    email = db.Column(db.String(100), nullable=False)
+    email = db.Column(db.String(100), nullable=False, index=True)
     message = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.now(), index=True)
 
 # Database model for contact submissions
 class ContactSubmission(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     first_name = db.Column(db.String(50), nullable=False)
     last_name = db.Column(db.String(50), nullable=False)
-    email = db.Column(db.String(100), nullable=False)
-    company_name = db.Column(db.String(100))
+    email = db.Column(db.String(100), nullable=False, index=True)
+    company_name = db.Column(db.String(100), index=True)
     phone = db.Column(db.String(20))
     message = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=db.func.now(), index=True)
+
+# Archived submissions: searchable columns stay plain, the full row is zlib-compressed JSON
+class ScheduledCallArchive(db.Model):
+    __tablename__ = 'scheduled_call_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # the original row's id
+    created_at = db.Column(db.DateTime, index=True)
+    email = db.Column(db.String(100), nullable=False, index=True)
+    data = db.Column(db.LargeBinary, nullable=False)
+
+class ContactSubmissionArchive(db.Model):
+    __tablename__ = 'contact_submission_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    created_at = db.Column(db.DateTime, index=True)
+    email = db.Column(db.String(100), nullable=False, index=True)
+    company_name = db.Column(db.String(100), index=True)
+    data = db.Column(db.LargeBinary, nullable=False)
 
 # Create the database tables
+# create_all() only creates missing tables; it never alters existing ones. Columns and indexes
+# added to a model after its table went live are listed below, and upgrade_schema() adds
+# whichever the primary lacks (replicas get them through replication). It runs here at startup
+# and as `flask upgrade-db`. Workers starting together may race to add the same column or
+# index; the loser logs a warning and carries on.
+SCHEMA_COLUMNS = [
+    # (model, column, value for existing rows, or None to leave them NULL)
+    (User, 'created_at', db.func.now()),  # existing signups get a full purge window from the upgrade
+    (ScheduledCall, 'created_at', None),  # NULL means older than the column, so archived first
+    (ContactSubmission, 'created_at', None),
+]
+SCHEMA_INDEXES = [
+    # (model, column) for single-column indexes declared with index=True
+    (ScheduledCall, 'email'),  # admin prefix search
+    (ContactSubmission, 'email'),
+    (ContactSubmission, 'company_name'),
+    (User, 'created_at'),  # unverified user purge
+    (ScheduledCall, 'created_at'),  # submission archive
+    (ContactSubmission, 'created_at'),
+]
+
+def upgrade_schema():
+    """Add the SCHEMA_COLUMNS and SCHEMA_INDEXES the primary database lacks; returns what was added."""
+    added = []
+    for model, name, backfill in SCHEMA_COLUMNS:
+        table = model.__table__
+        if name in {column['name'] for column in sa_inspect(db.engine).get_columns(table.name)}:
+            continue
+        try:
+            with db.engine.begin() as connection:
+                quote = connection.dialect.identifier_preparer
+                connection.exec_driver_sql(f"ALTER TABLE {quote.format_table(table)} ADD COLUMN {quote.quote(name)} "
+                                           f"{table.columns[name].type.compile(connection.dialect)}")
+                if backfill is not None:
+                    connection.execute(table.update().where(table.columns[name].is_(None)).values({name: backfill}))
+        except DBAPIError as e:
+            logging.warning('Could not add column %s.%s: %s', table.name, name, e.orig)
+            continue
+        added.append(f"{table.name}.{name}")
+    for model, name in SCHEMA_INDEXES:
+        table = model.__table__
+        existing = {index['name'] for index in sa_inspect(db.engine).get_indexes(table.name)}
+        for index in table.indexes:
+            if [column.name for column in index.columns] != [name] or index.name in existing:
+                continue
+            try:
+                with db.engine.begin() as connection:
+                    index.create(connection)
+            except DBAPIError as e:
+                logging.warning('Could not create index %s: %s', index.name, e.orig)
+                continue
+            added.append(index.name)
+    return added
+
 with app.app_context():
-    db.create_all()
+    db.create_all(bind_key=None)  # replicas get their schema through replication
+    for change in upgrade_schema():
+        logging.info('Schema upgraded: added %s', change)
+
+@app.cli.command('upgrade-db')
+def upgrade_db():
+    """Add columns and indexes that models gained after their tables were created."""
+    added = upgrade_schema()
+    click.echo('Added ' + ', '.join(added) if added else 'Schema is up to date')
 
 # Function to get the current year
 def get_current_year():
     return datetime.now().year
 
+# User Lookups
+# Auth routes look users up by email through a short-TTL cache keyed by the address exactly as
+# the query matches it, so a case variant can never cache a miss for a real account. Password
+# hashes stay out of the cache; check_user_password() reads them from the database. Misses are
+# loaded from the primary, never a replica, so replication lag can't be cached for a TTL. Unknown
+# emails are cached too (for less time), so enumeration and credential-stuffing traffic
+# stops at Redis. Lookups skip the in-process tier (local=False): auth state such as
+# is_verified must not outlive its Redis entry in one worker while an invalidation is in flight
+# or lost, so invalidate_user() deleting the Redis entry is enough.
+USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL', 60))
+USER_NEGATIVE_CACHE_TTL = int(os.environ.get('USER_NEGATIVE_CACHE_TTL', 30))
+
+def normalize_email(address):
+    return (address or '').strip()
+
+def user_cache_key(address):
+    return cache_key('user', normalize_email(address))
+
+def lookup_user(address):
+    """Return a snapshot dict (id, email, is_verified) of the user for an email, or None."""
+    def load():
+        # Always from the primary: a lagging replica's stale is_verified, or its miss for a new
+        # account, would be cached for the whole TTL, long after replication caught up
+        query = db.select(User).filter_by(email=normalize_email(address))
+        user = db.session.execute(query, bind_arguments={'bind': primary_engine}).scalars().first()
+        if user is None:
+            return None
+        return {'id': user.id, 'email': user.email, 'is_verified': user.is_verified}
+    return cache.get_or_compute(user_cache_key(address), load, local=False,
+                                ttl=lambda user: USER_CACHE_TTL if user else USER_NEGATIVE_CACHE_TTL)
+
+def check_user_password(user, password):
+    """Verify a password for a lookup_user() snapshot against the hash stored in the database."""
+    # A lagging replica could still accept a password that was just changed
+    db.session.info['use_primary'] = True
+    stored = db.session.query(User.password).filter_by(id=user['id']).scalar()
+    return stored is not None and check_password_hash(stored, password or '')
+
+def invalidate_user(address):
+    """Drop the cached lookup for an email after the user row changes."""
+    cache.delete(user_cache_key(address))
+
+# Idempotent Forms
+# Forms carry a random idempotency_key (templates/idempotency-field.html fills it in the browser,
+# so cached pages still give every visitor their own). The first POST for a key and payload claims
+# it with SET NX. Repeats within IDEMPOTENCY_WINDOW, from a double-click or a browser retry, get
+# the first request's redirect and flash messages back without touching MySQL or SMTP. A repeat
+# that arrives while the first is still running waits briefly for its result.
+IDEMPOTENCY_FIELD = 'idempotency_key'
+IDEMPOTENCY_WINDOW = int(os.environ.get('IDEMPOTENCY_WINDOW', 600))
+IDEMPOTENCY_WAIT = float(os.environ.get('IDEMPOTENCY_WAIT', 5))
+IDEMPOTENT_REPLAYS = Counter('idempotent_replays_total', 'Duplicate form submissions answered from the first result', ['endpoint'])
+
+def idempotency_redis_key(token):
+    """Key on the endpoint, the token and a keyed hash of the rest of the form (which may hold passwords)."""
+    payload = json.dumps(sorted((k, v) for k, v in request.form.items(multi=True) if k != IDEMPOTENCY_FIELD))
+    digest = hmac.new(app.secret_key.encode(), payload.encode(), hashlib.sha256).hexdigest()
+    return f"idempotency:{request.endpoint}:{token[:64]}:{digest}"
+
+def replay_result(stored):
+    result = json.loads(stored)
+    for category, message in result['flashes']:
+        flash(message, category)
+    IDEMPOTENT_REPLAYS.labels(request.endpoint).inc()
+    return redirect(result['location'])
+
+def idempotent(view):
+    """Answer repeated POSTs of the same form submission with the first one's redirect."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        token = request.form.get(IDEMPOTENCY_FIELD, '') if request.method == 'POST' else ''
+        if not token:
+            return view(*args, **kwargs)
+        key = idempotency_redis_key(token)
+        try:
+            claimed = redis.set(key, 'pending', nx=True, ex=IDEMPOTENCY_WINDOW)
+            if not claimed:
+                deadline = time.time() + IDEMPOTENCY_WAIT
+                while (stored := redis.get(key)) == b'pending' and time.time() < deadline:
+                    time.sleep(0.05)
+                if stored and stored != b'pending':
+                    return replay_result(stored)
+                # The first request failed or is stuck; handle this one normally
+        except RedisError as e:
+            logging.warning('Idempotency check skipped: %s', e)
+            return view(*args, **kwargs)
+        g.flash_log = []
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            try:
+                redis.delete(key)  # let a retry run again
+            except RedisError:
+                pass
+            raise
+        try:
+            if response.status_code in (301, 302, 303, 307, 308):
+                redis.set(key, json.dumps({'location': response.location, 'flashes': g.flash_log}), ex=IDEMPOTENCY_WINDOW)
+            else:
+                redis.delete(key)
+        except RedisError as e:
+            logging.warning('Could not record idempotent result: %s', e)
+        return response
+    return wrapped
+
+@message_flashed.connect_via(app)
+def log_flash(sender, message, category, **extra):
+    if 'flash_log' in g:
+        g.flash_log.append((category, message))
+
 # Home Route
 @app.route('/')
+@cached_view()
 def home():
     """Render the home page."""
     return render_template('index.html', current_year=get_current_year())
 
 # Function to create a styled email body for the client
+@traced('email.build_client_body')
 def create_client_email_body(title, first_name, last_name, message):
     current_year = datetime.now().year
     return f"""
@@ -519,6 +2050,7 @@ def create_client_email_body(title, first_name, last_name, message):
     """
 
 # Function to create a styled email body for yourself
+@traced('email.build_notification_body')
 def create_notification_email_body(first_name, last_name, email, message):
     current_year = datetime.now().year
     return f"""
@@ -984,19 +2516,20 @@ def subscribe():
     msg_client = Message("Thank you for subscribing!", recipients=[email])
     msg_client.html = create_client_email_body("Thank You for Subscribing!", "Subscriber", "", "You have successfully subscribed to our newsletter.")
     msg_client.sender = app.config['MAIL_DEFAULT_SENDER']  # Set the sender's email
-    mail.send(msg_client)
+    queue_email(msg_client, 'low')
 
     # Send notification email to yourself
     msg_notification = Message("New Subscription Notification",  recipients=[os.getenv("NOTIFICATION_EMAIL")])  # Replace with your email
     msg_notification.html = create_notification_email_body("Subscriber", "", email, "A new subscription has been made.")
     msg_notification.sender = app.config['MAIL_DEFAULT_SENDER']  # Set the sender's email
-    mail.send(msg_notification)
+    queue_email(msg_notification)
 
     flash('Thank you for subscribing! A confirmation email has been sent.', 'success')
     return redirect(url_for('home'))
 
 # Update the schedule_call route
 @app.route('/schedule-call', methods=['POST'])
+@idempotent
 def schedule_call():
     first_name = request.form.get('ServiceFirstnameInput')
     last_name = request.form.get('serviceLastnameInput')
@@ -1017,19 +2550,20 @@ def schedule_call():
     msg_client = Message("Thank You for Scheduling a Call!", recipients=[email])
     msg_client.html = create_client_email_body("Thank You for Scheduling a Call!", first_name, last_name, "We appreciate your interest in our Structured On-The-Job Training (SOJT) programs designed to empower individuals and organizations to accelerate learning and enhance performance")
     msg_client.sender = app.config['MAIL_DEFAULT_SENDER']  # Set the sender's email
-    mail.send(msg_client)
+    queue_email(msg_client, 'low')
 
     # Send notification email to yourself
     msg_notification = Message("New Call Request Notification",  recipients=[os.getenv("NOTIFICATION_EMAIL")])  # Replace with your email
     msg_notification.html = create_notification_email_body(first_name, last_name , email, message)
     msg_notification.sender = app.config['MAIL_DEFAULT_SENDER']  # Set the sender's email
-    mail.send(msg_notification)
+    queue_email(msg_notification)
 
     flash('Thank you for scheduling a call! A confirmation email has been sent.', 'success')
     return redirect(url_for('home'))
 
 # Update the submit_contact route
 @app.route('/submit_contact', methods=['POST'])
+@idempotent
 def submit_contact():
     first_name = request.form.get('contactFirstNameInput')
     last_name = request.form.get('contactLastNameInput')
@@ -1061,13 +2595,13 @@ def submit_contact():
     msg_client = Message("Thank You for Contacting Us!", recipients=[email])
     msg_client.html = create_client_email_body("Thank You for Contacting Us!", first_name, last_name, "We appreciate your interest in our Structured On-The-Job Training (SOJT) programs designed to empower individuals and organizations to accelerate learning and enhance performance")
     msg_client.sender = app.config['MAIL_DEFAULT_SENDER']  # Set the sender's email
-    mail.send(msg_client)
+    queue_email(msg_client, 'low')
 
     # Send notification email to yourself
     msg_notification = Message("New Contact Request Notification",  recipients=[os.getenv("NOTIFICATION_EMAIL")])  # Replace with your email
     msg_notification.html = create_notification_email_body(first_name, last_name, email, message)
     msg_notification.sender = app.config['MAIL_DEFAULT_SENDER']  # Set the sender's email
-    mail.send(msg_notification)
+    queue_email(msg_notification)
 
     flash('Thank you for contacting us! We will be in touch soon.', 'success')
     return redirect(url_for('home'))
@@ -1080,32 +2614,38 @@ def page_not_found(e):
 
 # Information Pages
 @app.route('/about')
+@cached_view()
 def about():
     """Render the about page, describing the organization and its mission."""
     return render_template('about.html', current_year=get_current_year(), email=email)
 
 @app.route('/contact')
+@cached_view()
 def contact():
     """Render the contact page for inquiries."""
     return render_template('contact.html', current_year=get_current_year(),email=email)
 
 @app.route('/privacy')
+@cached_view()
 def privacy():
     """Render the privacy policy page."""
     return render_template('privacy.html', current_year=get_current_year())
 
 @app.route('/terms')
+@cached_view()
 def terms():
     """Render the terms and conditions page."""
     return render_template('terms.html', current_year=get_current_year())
 
 # Programs and Careers
 @app.route('/careers')
+@cached_view()
 def careers():
     """Render the careers page, showcasing job opportunities and training programs."""
     return render_template('careers.html', current_year=get_current_year())
 
 @app.route('/programs')
+@cached_view()
 def programs():
     """Render the programs page, detailing the structured on-the-job training offerings."""
     return render_template('programs.html', current_year=get_current_year())
@@ -1114,6 +2654,7 @@ def programs():
 # User Signup Route
 
 @app.route('/signup', methods=['GET', 'POST'])
+@idempotent
 def signup():
     if request.method == 'POST':
         email = request.form.get('signupEmailInput')
@@ -1143,7 +2684,7 @@ def signup():
             return redirect(url_for('signup'))
 
         # Check if the email is already registered
-        existing_user = User.query.filter_by(email=email).first()
+        existing_user = lookup_user(email)
         if existing_user:
             flash('Email is already registered.', 'info')
             return redirect(url_for('signup'))
@@ -1153,13 +2694,14 @@ def signup():
         new_user = User(email=email, password=hashed_password)
         db.session.add(new_user)
         db.session.commit()
+        invalidate_user(email)
 
         # Generate a token for email verification
         token = s.dumps(email, salt='email-confirm')
         verification_link = url_for('confirm_email', token=token, _external=True)
         msg = Message("Email Verification", recipients=[email])
         msg.body = f"Please click the link to verify your email: {verification_link}"
-        mail.send(msg)
+        queue_email(msg, 'high')
 
         flash('Account created successfully! Please check your email to verify your account.', 'success')
         return redirect(url_for('signin'))
@@ -1171,14 +2713,16 @@ def signup():
 def confirm_email(token):
     try:
         email = s.loads(token, salt='email-confirm', max_age=3600)
-        user = User.query.filter_by(email=email).first()
+        cached_user = lookup_user(email)
+        user = db.session.get(User, cached_user['id']) if cached_user else None
         if user:
             user.is_verified = True
             db.session.commit()
+            invalidate_user(email)
             flash('Email verified successfully!', 'success')
             return redirect(url_for('signin'))
     except Exception as e:
-        logging.error(f"Email confirmation error: {e}")
+        logging.error('Email confirmation error: %s', e)
         flash('The confirmation link is invalid or has expired.', 'error')
     return redirect(url_for('signup'))
 
@@ -1189,10 +2733,10 @@ def signin():
         email = request.form.get('signinEmailInput')
         password = request.form.get('formSignUpPassword')
 
-        user = User.query.filter_by(email=email).first()
-        if user and check_password_hash(user.password, password):
-            if user.is_verified:
-                session['user_id'] = user.id
+        user = lookup_user(email)
+        if user and check_user_password(user, password):
+            if user['is_verified']:
+                session['user_id'] = user['id']
                 flash('Logged in successfully!', 'success')
                 return redirect(url_for('home'))
             else:
@@ -1215,13 +2759,13 @@ def logout():
 def forget_password():
     if request.method == 'POST':
         email = request.form.get('forgetEmailInput2')
-        user = User.query.filter_by(email=email).first()
+        user = lookup_user(email)
         if user:
             token = s.dumps(email, salt='password-reset')
             reset_link = url_for('reset_with_token', token=token, _external=True)
             msg = Message("Password Reset Request", recipients=[email])
             msg.body = f"Please click the link to reset your password: {reset_link}"
-            mail.send(msg)
+            queue_email(msg, 'high')
             flash('A password reset link has been sent to your email.', 'info')
             return redirect(url_for('signin'))
         flash('Email not found.', 'error')
@@ -1240,18 +2784,20 @@ def reset_with_token(token):
                 flash('Password must be at least 8 characters long.', 'error')
                 return redirect(url_for('reset_with_token', token=token))
 
-            user = User.query.filter_by(email=email).first()
+            cached_user = lookup_user(email)
+            user = db.session.get(User, cached_user['id']) if cached_user else None
             if user:
                 user.password = generate_password_hash(new_password)
                 db.session.commit()
+                invalidate_user(email)
                 flash('Your password has been updated!', 'success')
                 return redirect(url_for('signin'))
     except Exception as e:
-        logging.error(f"Password reset error: {e}")
+        logging.error('Password reset error: %s', e)
         flash('The reset link is invalid or has expired.', 'error')
         return redirect(url_for('forget_password'))
 
-    return render_template('reset-password.html')
+    return render_template('reset-password.html', token=token)
 
 # Verification and Questions
 @app.route('/opt-verification')
@@ -1260,9 +2806,1418 @@ def opt_verification():
     return render_template('opt-verification.html')
 
 @app.route('/questions')
+@cached_view()
 def questions():
     """Render the frequently asked questions page."""
     return render_template('questions.html', current_year=get_current_year())
 
+# Response Compression
+# Whitespace between tags in rendered HTML is collapsed (tags, their attribute values and <pre>,
+# <script>, <style> and <textarea> are left alone) and the result is compressed with Brotli or gzip.
+# Results are memoized by body hash, so repeat renders of the same page skip both steps. Streamed
+# responses are gzipped on the fly when the client accepts gzip and sent as they are otherwise. A
+# strong ETag on a body we rewrite is made weak, since the bytes now differ per encoding. Bodies
+# large enough to compress always carry Vary: Accept-Encoding, the uncompressed copy included.
+MINIFY_HTML = os.environ.get('MINIFY_HTML', 'true').lower() in ('1', 'true', 'yes')
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('BROTLI_QUALITY', 5))
+COMPRESS_CACHE_SIZE = int(os.environ.get('COMPRESS_CACHE_SIZE', 256))
+COMPRESSIBLE_TYPES = {'text/html', 'text/css', 'text/plain', 'application/json', 'application/javascript', 'image/svg+xml'}
+PROTECTED_BLOCKS = re.compile(r'(<(pre|script|style|textarea)\b.*?</\2\s*>)', re.S | re.I)
+HTML_COMMENTS = re.compile(r'<!--(?!\[if|<!|>).*?-->', re.S)
+# A whole tag, quoted attribute values included even when they contain '>'
+HTML_TAG = re.compile(r"""(<[^>"']*(?:(?:"[^"]*"|'[^']*')[^>"']*)*>)""")
+WHITESPACE = re.compile(r'\s+')
+
+compressed_bodies = LocalCache(COMPRESS_CACHE_SIZE, name='compressed')
+
+def minify_html(html):
+    """Collapse whitespace runs between tags and drop comments outside whitespace-sensitive blocks."""
+    parts = PROTECTED_BLOCKS.split(html)
+    out = []
+    # split() yields text, whole protected block, tag name, text, ...
+    for i in range(0, len(parts), 3):
+        # Tags are kept as written, so attribute values (title, alt, data-*, value) keep their whitespace
+        for j, piece in enumerate(HTML_TAG.split(HTML_COMMENTS.sub('', parts[i]))):
+            out.append(piece if j % 2 else WHITESPACE.sub(' ', piece))
+        if i + 1 < len(parts):
+            out.append(parts[i + 1])
+    return ''.join(out)
+
+def compress(data, encoding, level=None):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY if level is None else level)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL if level is None else level, mtime=0)
+
+def available_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+def negotiate_encoding():
+    return request.accept_encodings.best_match(available_encodings())
+
+def transform_body(body, minify, encoding):
+    """Minify and/or compress a body, memoized by its hash."""
+    key = (hashlib.sha1(body).digest(), minify, encoding)
+    entry = compressed_bodies.get(key)
+    if entry is not None:
+        return entry.value
+    if minify:
+        body = minify_html(body.decode('utf-8')).encode('utf-8')
+    if encoding and len(body) >= COMPRESS_MIN_SIZE:
+        body = compress(body, encoding)
+    else:
+        encoding = None
+    compressed_bodies.set(key, CacheEntry((body, encoding), math.inf))
+    return body, encoding
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk if isinstance(chunk, bytes) else chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.after_request
+def minify_and_compress(response):
+    if response.direct_passthrough or 'Content-Encoding' in response.headers or response.mimetype not in COMPRESSIBLE_TYPES:
+        return response
+    if request.method == 'HEAD' or response.status_code < 200 or response.status_code in (204, 304):
+        return response
+    encoding = negotiate_encoding()
+    if response.is_streamed:
+        if request.accept_encodings['gzip']:
+            response.response = gzip_stream(response.response)
+            response.headers['Content-Encoding'] = 'gzip'
+            response.headers.pop('Content-Length', None)
+        response.vary.add('Accept-Encoding')
+        return response
+    minify = MINIFY_HTML and response.mimetype == 'text/html'
+    if (response.content_length or 0) >= COMPRESS_MIN_SIZE:
+        # Other clients get this body compressed, so caches must key it on Accept-Encoding
+        response.vary.add('Accept-Encoding')
+    if not minify and (not encoding or (response.content_length or 0) < COMPRESS_MIN_SIZE):
+        return response
+    body, used = transform_body(response.get_data(), minify, encoding)
+    response.set_data(body)
+    if used:
+        response.headers['Content-Encoding'] = used
+    etag, weak = response.get_etag()
+    if etag and not weak and (used or minify):
+        response.set_etag(etag, weak=True)
+    return response
+
+# Pre-rendered Pages
+# `flask prerender` renders the informational pages to PRERENDER_DIR at build time. With
+# SERVE_PRERENDERED set, GETs for them are answered straight from disk (gunicorn hands the file
+# to sendfile).
+PRERENDER_DIR = os.environ.get('PRERENDER_DIR', 'prerendered')
+SERVE_PRERENDERED = os.environ.get('SERVE_PRERENDERED', '').lower() in ('1', 'true', 'yes')
+PRERENDER_MAX_AGE = int(os.environ.get('PRERENDER_MAX_AGE', 300))
+PRERENDER_PAGES = ['home', 'about', 'privacy', 'terms', 'careers', 'programs', 'questions']
+
+def prerendered_path(endpoint):
+    return os.path.join(PRERENDER_DIR, f"{endpoint}.html")
+
+@app.cli.command('prerender')
+def prerender():
+    """Render the informational pages to PRERENDER_DIR."""
+    os.makedirs(PRERENDER_DIR, exist_ok=True)
+    for endpoint in PRERENDER_PAGES:
+        with app.test_request_context(app.url_map.bind('localhost').build(endpoint)):
+            html = make_response(app.view_functions[endpoint]()).get_data(as_text=True)
+        body = (minify_html(html) if MINIFY_HTML else html).encode('utf-8')
+        path = prerendered_path(endpoint)
+        # Precompress at the highest levels, since this only happens at build time
+        variants = {path: body, path + '.gz': compress(body, 'gzip', 9)}
+        if brotli is not None:
+            variants[path + '.br'] = compress(body, 'br', 11)
+        for variant, data in variants.items():
+            # Write then rename so serving workers never read a half-written file
+            with open(variant + '.tmp', 'wb') as f:
+                f.write(data)
+            os.replace(variant + '.tmp', variant)
+        click.echo(f"Rendered {endpoint} -> {path} ({len(html)} -> {len(body)} bytes)")
+
+@app.before_request
+def serve_prerendered():
+    if not SERVE_PRERENDERED or request.method != 'GET' or request.endpoint not in PRERENDER_PAGES:
+        return None
+    path = prerendered_path(request.endpoint)
+    if not os.path.exists(path):
+        return None
+    encoding = negotiate_encoding()
+    suffix = {'br': '.br', 'gzip': '.gz'}.get(encoding)
+    if suffix and os.path.exists(path + suffix):
+        path += suffix
+    else:
+        encoding = None
+    response = send_file(os.path.abspath(path), mimetype='text/html', conditional=True, max_age=PRERENDER_MAX_AGE)
+    response.headers['Cache-Control'] = f"public, max-age={PRERENDER_MAX_AGE}"
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+# Site Search
+# `flask build-search-index` renders the content pages, splits each into sections at its headings
+# and writes an inverted index to SEARCH_INDEX_PATH. The file has a header, a sorted table of
+# fixed-width term entries, the term strings, the postings (document id and precomputed BM25
+# weight) and a small JSON list of the sections. Workers mmap it, so every process shares one copy
+# in the page cache. /search finds each query word's prefix range by binary search over the term
+# table and ranks the sections that match every word.
+SEARCH_INDEX_PATH = os.environ.get('SEARCH_INDEX_PATH', 'search.idx')
+SEARCH_PAGES = ['programs', 'careers', 'questions']
+SEARCH_MAX_RESULTS = 20
+SEARCH_PREFIX_EXPANSIONS = 64  # terms considered per query word, to bound one-letter prefixes
+SEARCH_INDEX_MAGIC = b'SIX1'
+SEARCH_HEADER = struct.Struct('<4sIIIII')  # magic, terms, term table, strings, postings, documents offsets
+SEARCH_TERM = struct.Struct('<IIII')  # string offset, string length, first posting, posting count
+SEARCH_POSTING = struct.Struct('<If')  # section id, weight
+SEARCH_WORD = re.compile(r'[a-z0-9]+')
+SEARCH_TITLE_BOOST = 3
+
+class SectionExtractor(HTMLParser):
+    """Collects [anchor, heading, text] sections from the <main> element of a rendered page."""
+    SKIP = {'script', 'style', 'svg', 'noscript'}
+
+    def __init__(self):
+        super().__init__()
+        self.sections = []
+        self.in_main = self.skipping = 0
+        self.heading = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'main':
+            self.in_main += 1
+        elif tag in self.SKIP:
+            self.skipping += 1
+        if self.in_main and tag in ('h1', 'h2', 'h3'):
+            self.heading = []
+            self.sections.append(['', '', []])
+        # Link to the heading's id, or else the first id inside the section (e.g. an FAQ answer)
+        if self.sections and not self.sections[-1][0] and attrs.get('id'):
+            self.sections[-1][0] = attrs['id']
+
+    def handle_endtag(self, tag):
+        if tag == 'main':
+            self.in_main -= 1
+        elif tag in self.SKIP:
+            self.skipping -= 1
+        elif tag in ('h1', 'h2', 'h3') and self.heading is not None:
+            self.sections[-1][1] = ' '.join(self.heading)
+            self.heading = None
+
+    def handle_data(self, data):
+        text = ' '.join(data.split())
+        if not text or not self.in_main or self.skipping or not self.sections:
+            return
+        (self.heading if self.heading is not None else self.sections[-1][2]).append(text)
+
+def build_search_index(path=SEARCH_INDEX_PATH, k1=1.2, b=0.75):
+    """Render SEARCH_PAGES, index their sections and write the index file; returns the section count."""
+    documents, term_counts = [], []
+    for endpoint in SEARCH_PAGES:
+        with app.test_request_context(app.url_map.bind('localhost').build(endpoint)):
+            html = make_response(app.view_functions[endpoint]()).get_data(as_text=True)
+        extractor = SectionExtractor()
+        extractor.feed(html)
+        for anchor, title, body in extractor.sections:
+            text = ' '.join(body)
+            if not title or not text:
+                continue
+            counts = collections.Counter(SEARCH_WORD.findall(text.lower()))
+            for word in SEARCH_WORD.findall(title.lower()):
+                counts[word] += SEARCH_TITLE_BOOST
+            documents.append([endpoint, anchor, title, text[:200]])
+            term_counts.append(counts)
+
+    average_length = sum(sum(c.values()) for c in term_counts) / max(len(term_counts), 1)
+    postings = collections.defaultdict(list)
+    for doc_id, counts in enumerate(term_counts):
+        length = sum(counts.values())
+        for term, tf in counts.items():
+            postings[term].append((doc_id, tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / average_length))))
+
+    terms = sorted(postings)
+    strings, table, posting_data = bytearray(), bytearray(), bytearray()
+    first = 0
+    for term in terms:
+        encoded = term.encode()
+        idf = math.log(1 + (len(documents) - len(postings[term]) + 0.5) / (len(postings[term]) + 0.5))
+        table += SEARCH_TERM.pack(len(strings), len(encoded), first, len(postings[term]))
+        strings += encoded
+        for doc_id, weight in postings[term]:
+            posting_data += SEARCH_POSTING.pack(doc_id, weight * idf)
+        first += len(postings[term])
+    docs = json.dumps(documents).encode()
+
+    table_offset = SEARCH_HEADER.size
+    strings_offset = table_offset + len(table)
+    postings_offset = strings_offset + len(strings)
+    docs_offset = postings_offset + len(posting_data)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(SEARCH_HEADER.pack(SEARCH_INDEX_MAGIC, len(terms), table_offset, strings_offset, postings_offset, docs_offset))
+        f.write(table + strings + posting_data + docs)
+    os.replace(path + '.tmp', path)  # workers keep reading the old file until they reopen
+    return len(documents)
+
+class SearchIndex:
+    """Read-only view of an index file written by build_search_index."""
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.term_count, self.table_offset, self.strings_offset, self.postings_offset, docs_offset = \
+            SEARCH_HEADER.unpack_from(self.data)
+        if magic != SEARCH_INDEX_MAGIC:
+            raise ValueError(f"{path} is not a search index")
+        self.documents = json.loads(self.data[docs_offset:])
+
+    def term(self, i):
+        string_offset, length, first, count = SEARCH_TERM.unpack_from(self.data, self.table_offset + i * SEARCH_TERM.size)
+        start = self.strings_offset + string_offset
+        return self.data[start:start + length], first, count
+
+    def prefix_postings(self, prefix):
+        """Best weight per section over the terms starting with prefix."""
+        lo, hi = 0, self.term_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.term(mid)[0] < prefix:
+                lo = mid + 1
+            else:
+                hi = mid
+        scores = {}
+        for i in range(lo, min(lo + SEARCH_PREFIX_EXPANSIONS, self.term_count)):
+            term, first, count = self.term(i)
+            if not term.startswith(prefix):
+                break
+            exact = 1.0 if term == prefix else 0.8
+            for doc_id, weight in SEARCH_POSTING.iter_unpack(
+                    self.data[self.postings_offset + first * SEARCH_POSTING.size:
+                              self.postings_offset + (first + count) * SEARCH_POSTING.size]):
+                scores[doc_id] = max(scores.get(doc_id, 0.0), weight * exact)
+        return scores
+
+    def search(self, query, limit=10):
+        """Sections matching every word of query as a prefix, best first."""
+        words = SEARCH_WORD.findall(query.lower())[:8]
+        if not words:
+            return []
+        totals = None
+        for word in words:
+            scores = self.prefix_postings(word.encode())
+            totals = scores if totals is None else {d: totals[d] + s for d, s in scores.items() if d in totals}
+            if not totals:
+                return []
+        best = heapq.nlargest(limit, totals.items(), key=lambda item: item[1])
+        return [(self.documents[doc_id], score) for doc_id, score in best]
+
+search_index = None
+
+def get_search_index():
+    global search_index
+    if search_index is None and os.path.exists(SEARCH_INDEX_PATH):
+        search_index = SearchIndex(SEARCH_INDEX_PATH)
+    return search_index
+
+@app.cli.command('build-search-index')
+def build_search_index_command():
+    """Index the programs, careers and FAQ pages into SEARCH_INDEX_PATH."""
+    sections = build_search_index()
+    click.echo(f"Indexed {sections} sections into {SEARCH_INDEX_PATH} ({os.path.getsize(SEARCH_INDEX_PATH)} bytes)")
+
+@app.route('/search')
+def search():
+    """Return ranked sections for ?q= as JSON."""
+    index = get_search_index()
+    if index is None:
+        return jsonify({'error': 'Search is not available yet.'}), 503
+    limit = max(1, min(request.args.get('limit', 10, type=int), SEARCH_MAX_RESULTS))
+    results = [{
+        'title': title,
+        'url': url_for(endpoint) + (f"#{anchor}" if anchor else ''),
+        'snippet': snippet,
+        'score': round(score, 3),
+    } for (endpoint, anchor, title, snippet), score in index.search(request.args.get('q', ''), limit)]
+    response = jsonify({'query': request.args.get('q', ''), 'results': results})
+    response.headers['Cache-Control'] = f"public, max-age={PAGE_MAX_AGE}"
+    return response
+
+# Icon Font Subsets
+# `flask subset-fonts` scans templates and our own scripts for the bx-*/bi-* classes actually used
+# and writes woff2 fonts holding only those glyphs, plus matching trimmed stylesheets, to
+# static/FONT_SUBSET_DIR. When the build output exists, url_for('static', ...) for the full
+# stylesheets and fonts resolves to the subsets instead, so templates need no changes.
+FONT_SUBSETS = os.environ.get('FONT_SUBSETS', 'true').lower() in ('1', 'true', 'yes')
+FONT_SUBSET_DIR = 'assets/fonts/subset'
+ICON_FONTS = [
+    # (stylesheet, woff2 font) under static/
+    ('assets/fonts/css/boxicons.min.css', 'assets/fonts/fonts/boxicons.woff2'),
+    ('assets/libs/bootstrap-icons/font/bootstrap-icons.min.css', 'assets/libs/bootstrap-icons/font/fonts/bootstrap-iconsafdf.woff2'),
+]
+ICON_SOURCE_DIRS = ['templates', 'static/assets/js']
+ICON_CLASS = re.compile(r'\b((?:bx[sl]?|bi)-[a-z0-9-]+)')
+GLYPH_RULE = re.compile(r'\.((?:bx[sl]?|bi)-[\w-]+)::?before\{content:\s*"\\([0-9a-fA-F]+)"\}')
+FONT_FACE_RULE = re.compile(r'@font-face\s*\{[^}]*\}')
+FONT_FAMILY = re.compile(r'font-family:\s*([^;}]+)')
+
+def load_font_subsets():
+    manifest = os.path.join(app.static_folder, FONT_SUBSET_DIR, 'manifest.json')
+    if not FONT_SUBSETS or not os.path.exists(manifest):
+        return {}
+    with open(manifest) as f:
+        return json.load(f)
+
+font_subsets = load_font_subsets()
+
+@app.url_defaults
+def use_font_subsets(endpoint, values):
+    if endpoint == 'static' and values.get('filename') in font_subsets:
+        values['filename'] = font_subsets[values['filename']]
+
+def used_icon_classes():
+    """Collect every bx-*/bi-* class named in the templates and our scripts."""
+    used = set()
+    for directory in ICON_SOURCE_DIRS:
+        for root, _, files in os.walk(os.path.join(app.root_path, directory)):
+            for name in files:
+                if name.endswith(('.html', '.js')):
+                    with open(os.path.join(root, name), encoding='utf-8', errors='ignore') as f:
+                        used.update(ICON_CLASS.findall(f.read()))
+    return used
+
+@app.cli.command('subset-fonts')
+def subset_fonts():
+    """Write icon fonts and stylesheets trimmed to the glyphs the site uses."""
+    from fontTools import subset
+    from fontTools.ttLib import TTFont
+
+    logging.getLogger('fontTools').setLevel(logging.WARNING)
+    used = used_icon_classes()
+    out_dir = os.path.join(app.static_folder, FONT_SUBSET_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+    for stylesheet, font_file in ICON_FONTS:
+        with open(os.path.join(app.static_folder, stylesheet), encoding='utf-8') as f:
+            css = f.read()
+        codepoints = {int(code, 16) for name, code in GLYPH_RULE.findall(css) if name in used}
+        trimmed = GLYPH_RULE.sub(lambda m: m.group(0) if m.group(1) in used else '', css)
+        font_face = FONT_FACE_RULE.search(css)
+        family = FONT_FAMILY.search(font_face.group(0)).group(1).strip()
+        subset_font = posixpath.join(FONT_SUBSET_DIR, posixpath.basename(font_file))
+        trimmed = FONT_FACE_RULE.sub(
+            f"@font-face{{font-family:{family};font-weight:400;font-style:normal;font-display:block;"
+            f"src:url({posixpath.basename(font_file)}) format('woff2')}}", trimmed, count=1)
+
+        options = subset.Options()
+        options.flavor = 'woff2'
+        options.layout_features = ['*']
+        font = TTFont(os.path.join(app.static_folder, font_file))
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=codepoints)
+        subsetter.subset(font)
+        font.flavor = 'woff2'
+        font.save(os.path.join(app.static_folder, subset_font))
+
+        subset_css = posixpath.join(FONT_SUBSET_DIR, posixpath.basename(stylesheet))
+        with open(os.path.join(app.static_folder, subset_css), 'w', encoding='utf-8') as f:
+            f.write(trimmed)
+        manifest[stylesheet] = subset_css
+        manifest[font_file] = subset_font
+        before = os.path.getsize(os.path.join(app.static_folder, font_file))
+        after = os.path.getsize(os.path.join(app.static_folder, subset_font))
+        click.echo(f"{stylesheet}: {len(codepoints)} glyphs, font {before} -> {after} bytes, "
+                   f"css {len(css)} -> {len(trimmed)} bytes")
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    click.echo('Restart the app to serve the subsets.')
+
+# Preload Hints
+# Each page announces what its first paint waits on in a Link header: the theme stylesheet (the
+# last stylesheet in <head>, which the page cannot render without), the text font it loads (the
+# web-font stylesheet it @imports, else its first woff2), the page's first image (the hero, usually
+# the LCP element) and preconnects to the third-party origins in <head>. Everything else is left to
+# the browser's preload scanner, so the hints never compete with it for bandwidth. The header is
+# built once per page from PRELOAD_PAGES, so pre-rendered and cached responses carry it in every
+# worker without rendering first. Front proxies that support it (nginx early_hints, Cloudflare)
+# turn these into 103 Early Hints; gunicorn cannot send 1xx responses itself.
+PRELOAD_HINTS = os.environ.get('PRELOAD_HINTS', 'true').lower() in ('1', 'true', 'yes')
+PRELOAD_PAGES = {
+    'home': 'index.html',
+    'about': 'about.html',
+    'contact': 'contact.html',
+    'privacy': 'privacy.html',
+    'terms': 'terms.html',
+    'careers': 'careers.html',
+    'programs': 'programs.html',
+    'questions': 'questions.html',
+    'signup': 'signup.html',
+    'signin': 'signin.html',
+    'forget_password': 'forget-password.html',
+    'opt_verification': 'opt-verification.html',
+}
+STATIC_REF = re.compile(r"""url_for\(\s*['"]static['"]\s*,\s*filename\s*=\s*['"]([^'"]+)['"]\s*\)""")
+EXTENDS_TAG = re.compile(r"""{%\s*extends\s+['"]([^'"]+)['"]\s*%}""")
+STYLESHEET_TAG = re.compile(r'<link\b[^>]*\bstylesheet\b[^>]*>', re.I)
+ASSET_TAG = re.compile(r'<(?:link|script)\b[^>]*>', re.I)
+IMG_TAG = re.compile(r'<img\b[^>]*>', re.I)
+CSS_URL = re.compile(r"""url\(\s*['"]?([^'")]+)['"]?\s*\)""")
+EXTERNAL_ORIGIN = re.compile(r'https://[\w.-]+')
+WEB_FONT_CSS = 'https://fonts.googleapis.com/css'
+
+preload_headers = {}
+
+def template_source(name):
+    return app.jinja_env.loader.get_source(app.jinja_env, name)[0]
+
+def stylesheet_refs(filename):
+    """Return the woff2 fonts (as static filenames), web-font stylesheets and external origins a stylesheet loads."""
+    try:
+        with open(os.path.join(app.static_folder, filename), encoding='utf-8') as f:
+            css = f.read()
+    except OSError:
+        return [], [], []
+    fonts, web_fonts, origins = [], [], []
+    for url in CSS_URL.findall(css):
+        if url.startswith('https://'):
+            origins.append(EXTERNAL_ORIGIN.match(url).group(0))
+            if url.startswith(WEB_FONT_CSS):
+                web_fonts.append(url)
+        elif url.split('?')[0].endswith('.woff2'):
+            fonts.append(posixpath.normpath(posixpath.join(posixpath.dirname(filename), url.split('?')[0])))
+    return fonts, web_fonts, origins
+
+def critical_assets(name):
+    """Return ([(static filename or URL, as), ...], [origin, ...]) for a page template."""
+    page = template_source(name)
+    layout = page
+    while (parent := EXTENDS_TAG.search(layout)):
+        layout = template_source(parent.group(1))
+    head, _, body = layout.partition('</head>')
+    preloads, origins = [], EXTERNAL_ORIGIN.findall(head)
+    stylesheets = [ref.group(1) for ref in map(STATIC_REF.search, STYLESHEET_TAG.findall(head)) if ref]
+    if stylesheets:
+        preloads.append((stylesheets[-1], 'style'))
+        fonts, web_fonts, css_origins = stylesheet_refs(stylesheets[-1])
+        if web_fonts:
+            preloads.append((web_fonts[0], 'style'))
+        elif fonts:
+            preloads.append((fonts[0], 'font'))
+        origins.extend(css_origins)
+    hero = next(filter(None, map(STATIC_REF.search, IMG_TAG.findall(page if page is not layout else body))), None)
+    if hero:
+        preloads.append((hero.group(1), 'image'))
+    if 'https://fonts.googleapis.com' in origins:
+        # Google Fonts stylesheets load the font files from a second origin
+        origins.append('https://fonts.gstatic.com')
+    return preloads, list(dict.fromkeys(origins))
+
+def preload_header(endpoint):
+    """Build (once per page) the Link header value for a page endpoint."""
+    if endpoint not in preload_headers:
+        preloads, origins = critical_assets(PRELOAD_PAGES[endpoint])
+        links = [f"<{origin}>; rel=preconnect" + ('; crossorigin' if 'gstatic' in origin else '') for origin in origins]
+        for ref, kind in preloads:
+            href = ref if ref.startswith('https://') else url_for('static', filename=ref)
+            link = f"<{href}>; rel=preload; as={kind}"
+            if kind == 'font':
+                link += '; type="font/woff2"; crossorigin'
+            links.append(link)
+        preload_headers[endpoint] = ', '.join(links)
+    return preload_headers[endpoint]
+
+@app.after_request
+def add_preload_hints(response):
+    if not PRELOAD_HINTS or request.endpoint not in PRELOAD_PAGES or response.status_code != 200 \
+            or response.mimetype != 'text/html':
+        return response
+    try:
+        header = preload_header(request.endpoint)
+    except Exception as e:
+        logging.warning('Could not build preload hints for %s: %s', request.endpoint, e)
+        header = preload_headers[request.endpoint] = ''
+    if header:
+        response.headers.add('Link', header)
+    return response
+
+# Flash Messages
+# Pages never read the session themselves: base.html loads pending flashes from /flashes (or an
+# ESI include of /flashes.html when FLASH_MODE=esi), so every page shell is the same for all
+# visitors and can be cached at the edge. A script-readable cookie tells the page whether there is
+# anything to fetch, so ordinary page views make no extra request.
+FLASH_MODE = os.environ.get('FLASH_MODE', 'fetch')
+FLASH_COOKIE = 'has_flash'
+PAGE_MAX_AGE = int(os.environ.get('PAGE_MAX_AGE', 300))
+CACHEABLE_PAGES = PRERENDER_PAGES + ['contact']
+
+@app.context_processor
+def inject_flash_mode():
+    return {'flash_mode': FLASH_MODE, 'flash_cookie': FLASH_COOKIE}
+
+@message_flashed.connect_via(app)
+def note_flash(sender, message, category, **extra):
+    g.flashed = True
+
+@app.after_request
+def mark_pending_flashes(response):
+    if g.get('flashed'):
+        response.set_cookie(FLASH_COOKIE, '1', samesite='Lax', secure=request.is_secure)
+    elif request.endpoint in CACHEABLE_PAGES and request.method == 'GET' and response.status_code == 200 \
+            and not session.accessed and 'Cache-Control' not in response.headers:
+        # The shell did not touch the session, so it is safe to share between visitors
+        response.headers['Cache-Control'] = f"public, max-age={PAGE_MAX_AGE}"
+        if FLASH_MODE == 'esi':
+            response.headers['Surrogate-Control'] = 'content="ESI/1.0"'
+    return response
+
+def take_flashes(response_factory):
+    messages = get_flashed_messages(with_categories=True)
+    response = response_factory(messages)
+    response.headers['Cache-Control'] = 'no-store'
+    response.delete_cookie(FLASH_COOKIE)
+    return response
+
+@app.route('/flashes')
+def flashes():
+    """Return and clear pending flash messages as JSON."""
+    return take_flashes(lambda messages: jsonify([{'category': c, 'message': m} for c, m in messages]))
+
+@app.route('/flashes.html')
+def flashes_fragment():
+    """Return and clear pending flash messages as an HTML fragment for ESI."""
+    return take_flashes(lambda messages: Response(render_template('flashes.html', messages=messages)))
+
+# Service Worker
+# `flask build-asset-manifest` hashes every file under static/ into ASSET_MANIFEST_PATH, and
+# url_for('static', ...) appends the hash as ?v=, so a fingerprinted URL always names the same
+# bytes and is served as immutable. Files missing from the manifest are hashed on first use. /sw.js
+# is generated from the manifest: it precaches the base.html shell (stylesheets, their fonts and
+# every local script) and the main pages, answers fingerprinted assets cache-first and the cacheable
+# pages stale-while-revalidate. Its cache names carry a hash of the precache list, so a deploy
+# that changes any asset installs a new worker and drops the old caches.
+ASSET_FINGERPRINTS = os.environ.get('ASSET_FINGERPRINTS', 'true').lower() in ('1', 'true', 'yes')
+ASSET_MANIFEST_PATH = os.environ.get('ASSET_MANIFEST_PATH', 'asset-manifest.json')
+ASSET_MAX_AGE = 365 * 24 * 3600
+SERVICE_WORKER = os.environ.get('SERVICE_WORKER', 'true').lower() in ('1', 'true', 'yes')
+SERVICE_WORKER_PAGES = ['home', 'about', 'programs', 'careers']
+SERVICE_WORKER_ASSET_LIMIT = 200  # runtime-cached assets kept beyond the precache
+SHELL_TEMPLATE = 'base.html'
+
+service_worker_script = {}
+
+def hash_file(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()[:12]
+
+def load_asset_manifest():
+    if not ASSET_FINGERPRINTS or not os.path.exists(ASSET_MANIFEST_PATH):
+        return {}
+    with open(ASSET_MANIFEST_PATH) as f:
+        return json.load(f)
+
+asset_versions = load_asset_manifest()
+
+def asset_version(filename):
+    """Return the content hash for a static file, or '' if it does not exist."""
+    version = asset_versions.get(filename)
+    if version is None:
+        path = safe_join(app.static_folder, filename)
+        try:
+            version = hash_file(path) if path else ''
+        except OSError:
+            version = ''
+        asset_versions[filename] = version
+    return version
+
+@app.url_defaults
+def fingerprint_static(endpoint, values):
+    # Registered after use_font_subsets, so this hashes the file actually served
+    if ASSET_FINGERPRINTS and endpoint == 'static' and 'v' not in values and values.get('filename'):
+        version = asset_version(values['filename'])
+        if version:
+            values['v'] = version
+
+@app.after_request
+def cache_fingerprinted_assets(response):
+    if request.endpoint == 'static' and response.status_code in (200, 304) and request.args.get('v') \
+            and request.args['v'] == asset_version(request.view_args['filename']):
+        response.headers['Cache-Control'] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    return response
+
+@app.cli.command('build-asset-manifest')
+def build_asset_manifest():
+    """Hash every static file into ASSET_MANIFEST_PATH."""
+    manifest = {}
+    for root, _, files in os.walk(app.static_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            manifest[os.path.relpath(path, app.static_folder).replace(os.sep, '/')] = hash_file(path)
+    with open(ASSET_MANIFEST_PATH + '.tmp', 'w') as f:
+        json.dump(manifest, f, sort_keys=True)
+    os.replace(ASSET_MANIFEST_PATH + '.tmp', ASSET_MANIFEST_PATH)
+    click.echo(f"Hashed {len(manifest)} static files -> {ASSET_MANIFEST_PATH}")
+
+def shell_assets():
+    """Return the static files the layout loads: its stylesheets, their fonts and every local script."""
+    assets = []
+    for tag in ASSET_TAG.findall(template_source(SHELL_TEMPLATE)):
+        ref = STATIC_REF.search(tag)
+        if ref and tag.lower().startswith('<script'):
+            assets.append(ref.group(1))
+        elif ref and 'stylesheet' in tag:
+            assets.append(ref.group(1))
+            assets.extend(stylesheet_refs(ref.group(1))[0])
+    return list(dict.fromkeys(assets))
+
+def render_service_worker():
+    if not SERVICE_WORKER:
+        return render_template('sw.js', enabled=False)
+    assets = [url_for('static', filename=filename) for filename in shell_assets()]
+    pages = [url_for(endpoint) for endpoint in SERVICE_WORKER_PAGES]
+    version = hashlib.sha1(json.dumps(assets + pages).encode('utf-8')).hexdigest()[:12]
+    return render_template('sw.js', enabled=True, version=version, assets=assets, pages=pages,
+                           cacheable_pages=[url_for(endpoint) for endpoint in CACHEABLE_PAGES],
+                           static_prefix=app.static_url_path + '/', offline_page=url_for('home'),
+                           asset_limit=SERVICE_WORKER_ASSET_LIMIT)
+
+@app.context_processor
+def inject_service_worker():
+    return {'service_worker': SERVICE_WORKER}
+
+@app.route('/sw.js')
+def service_worker():
+    """Serve the generated service worker."""
+    if 'body' not in service_worker_script:
+        service_worker_script['body'] = render_service_worker()
+    response = Response(service_worker_script['body'], mimetype='application/javascript')
+    # Browsers check for a new worker on navigation; keep that check a cheap 304. The tag is weak
+    # because minify_and_compress serves different bytes per Content-Encoding.
+    response.headers['Cache-Control'] = 'no-cache'
+    response.add_etag(weak=True)
+    return response.make_conditional(request)
+
+# Static Offload
+# With STATIC_OFFLOAD set, the static endpoint only resolves and checks the path and the front
+# proxy sends the bytes, so image downloads no longer hold a gunicorn worker. 'x-accel' answers
+# with an X-Accel-Redirect under STATIC_ACCEL_PREFIX, which nginx must map to the static folder as
+# an internal location; nginx keeps our Content-Type and Cache-Control and adds ETag,
+# Last-Modified and range support itself. 'x-sendfile' turns on Flask's USE_X_SENDFILE for Apache
+# mod_xsendfile and lighttpd. Fingerprinted URLs get their immutable Cache-Control from
+# cache_fingerprinted_assets either way.
+STATIC_OFFLOAD = os.environ.get('STATIC_OFFLOAD', '').lower()  # '', 'x-accel' or 'x-sendfile'
+STATIC_ACCEL_PREFIX = os.environ.get('STATIC_ACCEL_PREFIX', '/_static/')
+app.config['USE_X_SENDFILE'] = STATIC_OFFLOAD == 'x-sendfile'
+
+def serve_static(filename):
+    """Resolve a static file and send it, or hand it to the front proxy."""
+    path = safe_join(app.static_folder, filename)
+    # Dotfiles (editor and Finder droppings such as .DS_Store) are never served
+    if path is None or any(part.startswith('.') for part in filename.split('/')) or not os.path.isfile(path):
+        abort(404)
+    if STATIC_OFFLOAD != 'x-accel':
+        return app.send_static_file(filename)
+    response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    response.headers['X-Accel-Redirect'] = STATIC_ACCEL_PREFIX + urllib.parse.quote(filename)
+    response.headers['Cache-Control'] = 'no-cache'
+    # nginx replaces the empty body with the file, so keep minify_and_compress away from it
+    response.direct_passthrough = True
+    return response
+
+app.view_functions['static'] = serve_static
+
+# Submission Archive
+# Scheduled calls and contact submissions older than SUBMISSION_RETENTION_DAYS are moved, in
+# batches, to archive tables that keep only the searchable columns plain and the rest of the row
+# compressed. The hot tables, their indexes and their backups then only hold recent rows.
+# search_submissions() reads both sides, so callers (like the admin listings) never need to know
+# where a row lives.
+SUBMISSION_RETENTION_DAYS = int(os.environ.get('SUBMISSION_RETENTION_DAYS', 180))
+ARCHIVE_MAX_AGE_DAYS = int(os.environ.get('ARCHIVE_MAX_AGE_DAYS', 0))  # 0 keeps archived rows forever
+ARCHIVES = {ScheduledCall: ScheduledCallArchive, ContactSubmission: ContactSubmissionArchive}
+ARCHIVED_FROM = {archive: model for model, archive in ARCHIVES.items()}
+
+def archive_row(row):
+    """Build the archive record for a hot row."""
+    archive = ARCHIVES[type(row)]
+    data = {column.name: getattr(row, column.name) for column in row.__table__.columns}
+    plain = {column.name: data[column.name] for column in archive.__table__.columns if column.name != 'data'}
+    if plain['created_at'] is None:
+        plain['created_at'] = datetime.now()  # rows from before the column: ARCHIVE_MAX_AGE_DAYS counts from now
+    return archive(data=zlib.compress(json.dumps(data, default=str).encode(), 9), **plain)
+
+def unarchive_row(record):
+    """Rebuild a detached instance of the original model from an archive record."""
+    data = json.loads(zlib.decompress(record.data))
+    if data.get('created_at'):
+        data['created_at'] = datetime.fromisoformat(data['created_at'])
+    return ARCHIVED_FROM[type(record)](**data)
+
+def archive_old_submissions():
+    """Move submissions past the retention window into the archive tables; returns the rows moved."""
+    cutoff = datetime.now() - timedelta(days=SUBMISSION_RETENTION_DAYS)
+    moved = 0
+    for model, archive in ARCHIVES.items():
+        def copy(ids):
+            # Inserted in the same transaction as the batch's delete, so a row is never in both or neither
+            db.session.add_all([archive_row(row) for row in model.query.filter(model.id.in_(ids))])
+        # Rows from before created_at existed have NULL there and count as old
+        old = model.query.filter(db.or_(model.created_at.is_(None), model.created_at < cutoff))
+        moved += delete_in_batches(old, model, on_batch=copy)
+        if ARCHIVE_MAX_AGE_DAYS:
+            expired = archive.query.filter(archive.created_at < datetime.now() - timedelta(days=ARCHIVE_MAX_AGE_DAYS))
+            delete_in_batches(expired, archive)
+    return moved
+
+def submission_sources(model, search_columns=(), q=''):
+    """The filtered hot query for a model plus, if it has one, the filtered archive query."""
+    sources = [(admin_filtered_query(model, search_columns, q), model)]
+    if model in ARCHIVES:
+        sources.append((admin_filtered_query(ARCHIVES[model], search_columns, q), ARCHIVES[model]))
+    return sources
+
+def search_submissions(model, search_columns=(), q='', after=None, before=None, limit=50):
+    """Rows from the hot table and its archive, matched by prefix search, paged by keyset on id.
+
+    Newest first below `after`, or the `limit` rows just above `before` in ascending order.
+    """
+    rows = []
+    for query, source in submission_sources(model, search_columns, q):
+        if before is not None:
+            found = query.filter(source.id > before).order_by(source.id.asc()).limit(limit).all()
+        else:
+            if after is not None:
+                query = query.filter(source.id < after)
+            found = query.order_by(source.id.desc()).limit(limit).all()
+        rows.extend(unarchive_row(row) if source is not model else row for row in found)
+    rows.sort(key=lambda row: row.id, reverse=before is None)
+    return rows[:limit]
+
+# Admin Dashboard
+# Tables staff can browse: url name -> (model, heading, columns, prefix-searchable columns)
+ADMIN_TABLES = {
+    'contacts': (ContactSubmission, 'Contact Submissions',
+                 ['first_name', 'last_name', 'email', 'company_name', 'phone', 'message'], ['email', 'company_name']),
+    'calls': (ScheduledCall, 'Scheduled Calls', ['first_name', 'last_name', 'email', 'message'], ['email']),
+    'subscriptions': (Subscription, 'Subscriptions', ['email'], ['email']),
+    'users': (User, 'Users', ['email', 'is_verified'], ['email']),
+}
+ADMIN_PAGE_SIZE = int(os.environ.get('ADMIN_PAGE_SIZE', 50))
+ADMIN_COUNT_TTL = int(os.environ.get('ADMIN_COUNT_TTL', 300))
+
+def current_admin():
+    """Return the signed-in user if they are verified staff listed in ADMIN_EMAILS, else None."""
+    user_id = session.get('user_id')
+    user = db.session.get(User, user_id) if user_id else None
+    if not user or not user.is_verified or user.email.lower() not in admin_emails:
+        return None
+    return user
+
+def admin_required(view):
+    """Only let verified staff accounts listed in ADMIN_EMAILS through."""
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        if current_admin() is None:
+            flash('Please sign in with a staff account to continue.', 'error')
+            return redirect(url_for('signin'))
+        return view(*args, **kwargs)
+    return wrapped
+
+def admin_filtered_query(model, search_columns, q):
+    """Build the base query, applying an indexed prefix search when q is given."""
+    query = model.query
+    if q:
+        # LIKE 'q%' can use the column index, unlike '%q%'
+        query = query.filter(db.or_(*[getattr(model, c).startswith(q, autoescape=True) for c in search_columns]))
+    return query
+
+def admin_cached_count(table, query, q):
+    """Return the row count for a listing, cached so paging never re-counts."""
+    return cache.get_or_compute(cache_key('admin', 'count', table, q), query.order_by(None).count, ADMIN_COUNT_TTL)
+
+@app.route('/admin')
+@admin_required
+def admin_dashboard():
+    """Send staff to the first admin listing."""
+    return redirect(url_for('admin_table', table='contacts'))
+
+@app.route('/admin/<table>')
+@admin_required
+def admin_table(table):
+    """Render one admin listing, newest first, using keyset pagination on the primary key."""
+    if table not in ADMIN_TABLES:
+        abort(404)
+    model, heading, columns, search_columns = ADMIN_TABLES[table]
+    q = request.args.get('q', '').strip()
+    after = request.args.get('after', type=int)
+    before = request.args.get('before', type=int)
+
+    # Archived rows are included, so search and paging cover everything ever submitted
+    total = sum(admin_cached_count(table if source is model else f"{table}-archive", query, q)
+                for query, source in submission_sources(model, search_columns, q))
+
+    # Seek past the last id seen instead of OFFSET, so every page costs the same.
+    # Plain InnoDB SELECTs are consistent non-locking reads, so browsing never blocks the form routes.
+    rows = search_submissions(model, search_columns, q, after, before, ADMIN_PAGE_SIZE + 1)
+    if before is not None:
+        has_newer = len(rows) > ADMIN_PAGE_SIZE
+        rows = list(reversed(rows[:ADMIN_PAGE_SIZE]))
+        has_older = True
+    else:
+        has_older = len(rows) > ADMIN_PAGE_SIZE
+        rows = rows[:ADMIN_PAGE_SIZE]
+        has_newer = after is not None
+
+    return render_template('admin.html', current_year=get_current_year(), tables=ADMIN_TABLES,
+                           table=table, heading=heading, columns=columns, rows=rows, q=q, total=total,
+                           newer_cursor=rows[0].id if rows and has_newer else None,
+                           older_cursor=rows[-1].id if rows and has_older else None)
+
+# Profiling
+# A sampling profiler that walks sys._current_frames() from a background thread and
+# aggregates collapsed stacks ("a;b;c 42"), the input format of flamegraph.pl and speedscope.
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.005))
+PROFILE_REQUEST_INTERVAL = float(os.environ.get('PROFILE_REQUEST_INTERVAL', 0.001))
+PROFILE_MAX_SECONDS = float(os.environ.get('PROFILE_MAX_SECONDS', 60))
+PROFILE_SIGNAL_SECONDS = float(os.environ.get('PROFILE_SIGNAL_SECONDS', 30))
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', 50))  # newest profiles kept in PROFILE_DIR
+PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN')
+
+def collapse_stack(frame):
+    """Render a frame and its callers as one root-first collapsed stack line."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+class SamplingProfiler:
+    """Samples one thread (or every thread but the excluded ones) until stopped."""
+    def __init__(self, thread_id=None, exclude=(), interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.exclude = set(exclude)
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self
+
+    def _run(self):
+        self.exclude.add(threading.get_ident())
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            if self.thread_id is not None:
+                frame = frames.get(self.thread_id)
+                if frame is not None:
+                    self.stacks[collapse_stack(frame)] += 1
+                continue
+            for thread_id, frame in frames.items():
+                if thread_id not in self.exclude:
+                    self.stacks[collapse_stack(frame)] += 1
+
+    def collapsed(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+def write_profile(profiler, label):
+    """Save a profile to PROFILE_DIR, pruning the oldest beyond PROFILE_KEEP, and return its path."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{label}-{os.getpid()}-{int(time.time())}.folded")
+    with open(path, 'w') as f:
+        f.write(profiler.collapsed())
+    profiles = []
+    for entry in os.scandir(PROFILE_DIR):
+        try:
+            if entry.name.endswith('.folded'):
+                profiles.append((entry.stat().st_mtime, entry.path))
+        except OSError:
+            pass  # removed by another worker's pruning
+    for _, old in sorted(profiles)[:-max(PROFILE_KEEP, 1)]:
+        try:
+            os.remove(old)
+        except OSError:
+            pass
+    return path
+
+def profile_on_signal(signum, frame):
+    """SIGUSR2 handler: profile this worker for PROFILE_SIGNAL_SECONDS and write the result to PROFILE_DIR."""
+    def run():
+        profiler = SamplingProfiler(exclude=[threading.get_ident()]).start()
+        time.sleep(PROFILE_SIGNAL_SECONDS)
+        path = write_profile(profiler.stop(), 'signal')
+        logging.info('Profile written to %s', path)
+    threading.Thread(target=run, name='signal-profiler', daemon=True).start()
+
+def install_profile_signal():
+    """Install the SIGUSR2 profiling handler; gunicorn workers call this from post_worker_init."""
+    signal.signal(signal.SIGUSR2, profile_on_signal)
+
+@app.before_request
+def start_request_profile():
+    # Profile just this request when it carries X-Profile with PROFILE_TOKEN, or comes from staff
+    header = request.headers.get('X-Profile')
+    if header is None:
+        return
+    # Compare bytes: compare_digest rejects non-ASCII str, and headers are client input
+    if not (PROFILE_TOKEN and hmac.compare_digest(header.encode(), PROFILE_TOKEN.encode())) and current_admin() is None:
+        return
+    g.request_profiler = SamplingProfiler(thread_id=threading.get_ident(), interval=PROFILE_REQUEST_INTERVAL).start()
+
+@app.after_request
+def finish_request_profile(response):
+    profiler = g.pop('request_profiler', None)
+    if profiler is not None:
+        profiler.stop()
+        # Name only; the directory is the server's business
+        response.headers['X-Profile-File'] = os.path.basename(write_profile(profiler, f"request-{request.endpoint}"))
+        response.headers['X-Profile-Samples'] = str(sum(profiler.stacks.values()))
+    return response
+
+@app.route('/admin/profile')
+@admin_required
+def admin_profile():
+    """Profile every thread of this worker for ?seconds=N and return collapsed stacks.
+
+    Only useful with threaded workers; a sync worker is busy sleeping here, so use SIGUSR2 instead.
+    """
+    seconds = min(request.args.get('seconds', 10, type=float), PROFILE_MAX_SECONDS)
+    profiler = SamplingProfiler(exclude=[threading.get_ident()]).start()
+    time.sleep(seconds)
+    profiler.stop()
+    return Response(profiler.collapsed(), mimetype='text/plain', headers={
+        'Content-Disposition': f"attachment; filename=profile-{os.getpid()}.folded",
+        'X-Profile-Pid': str(os.getpid()),
+    })
+
+# Metrics Endpoint
+@app.route('/metrics')
+def metrics():
+    """Expose Prometheus metrics, aggregated across gunicorn workers in multiprocess mode."""
+    token = os.environ.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        abort(403)
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+# Housekeeping Jobs
+# `flask scheduler` runs periodic maintenance outside the request path. Any number of copies can
+# run (e.g. one per host); whichever holds the Redis lock does the work and the rest stand by.
+# Last-run times live in Redis, so restarts and failovers don't rerun jobs early. Deletes go in
+# small primary-key batches, each in its own short transaction, so no job holds locks that the
+# form routes would wait on.
+SCHEDULER_LOCK_KEY = 'scheduler:lock'
+SCHEDULER_LAST_RUN_KEY = 'scheduler:last_run'
+SCHEDULER_LOCK_TTL = int(os.environ.get('SCHEDULER_LOCK_TTL', 60))
+SCHEDULER_POLL_INTERVAL = float(os.environ.get('SCHEDULER_POLL_INTERVAL', 15))
+HOUSEKEEPING_BATCH_SIZE = int(os.environ.get('HOUSEKEEPING_BATCH_SIZE', 500))
+HOUSEKEEPING_BATCH_PAUSE = float(os.environ.get('HOUSEKEEPING_BATCH_PAUSE', 0.1))
+UNVERIFIED_USER_MAX_AGE_DAYS = int(os.environ.get('UNVERIFIED_USER_MAX_AGE_DAYS', 7))
+JOB_RUNS = Counter('housekeeping_job_runs_total', 'Housekeeping job runs', ['job', 'status'])
+JOB_DURATION = Histogram('housekeeping_job_duration_seconds', 'Housekeeping job run time', ['job'],
+                         buckets=(.1, .5, 1, 5, 15, 60, 300, 900))
+
+# Release the lock only if we still own it
+RELEASE_LOCK_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+RENEW_LOCK_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) end return 0"
+
+def delete_in_batches(query, model, batch_size=HOUSEKEEPING_BATCH_SIZE, on_batch=None):
+    """Delete the rows matched by query in primary-key batches, committing each; returns the count."""
+    deleted = 0
+    while True:
+        rows = query.with_entities(model.id).order_by(model.id).limit(batch_size).all()
+        if not rows:
+            return deleted
+        ids = [row.id for row in rows]
+        if on_batch is not None:
+            on_batch(ids)
+        deleted += model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+        if len(ids) < batch_size:
+            return deleted
+        time.sleep(HOUSEKEEPING_BATCH_PAUSE)  # let replication and the form routes catch up
+
+def purge_unverified_users():
+    """Delete accounts that never confirmed their email within UNVERIFIED_USER_MAX_AGE_DAYS."""
+    cutoff = datetime.now() - timedelta(days=UNVERIFIED_USER_MAX_AGE_DAYS)
+    # Rows written without a timestamp (by workers still on the old schema) start their window now
+    User.query.filter(User.created_at.is_(None)).update({User.created_at: db.func.now()}, synchronize_session=False)
+    db.session.commit()
+    query = User.query.filter(db.or_(User.is_verified.is_(False), User.is_verified.is_(None)), User.created_at < cutoff)
+
+    def forget(ids):
+        for user in User.query.with_entities(User.email).filter(User.id.in_(ids)):
+            invalidate_user(user.email)
+    return delete_in_batches(query, User, on_batch=forget)
+
+def compact_tables():
+    """Reclaim space and refresh planner statistics after the purges."""
+    tables = [model.__table__.name for model in (User, Subscription, ScheduledCall, ContactSubmission,
+                                                 ScheduledCallArchive, ContactSubmissionArchive)]
+    dialect = db.engine.dialect.name
+    # These statements can't run inside a transaction
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        if dialect == 'mysql':
+            # InnoDB rebuilds the table online; reads and writes continue meanwhile
+            for table in tables:
+                connection.exec_driver_sql(f"OPTIMIZE TABLE `{table}`")
+        elif dialect == 'postgresql':
+            for table in tables:
+                connection.exec_driver_sql(f'VACUUM ANALYZE "{table}"')
+        elif dialect == 'sqlite':
+            connection.exec_driver_sql('VACUUM')
+        else:
+            logging.info('No compaction for the %s dialect', dialect)
+            return 0
+    return len(tables)
+
+def refresh_caches():
+    """Recompute the unfiltered admin counts so staff never wait on a cold COUNT(*)."""
+    refreshed = 0
+    for table, (model, heading, columns, search_columns) in ADMIN_TABLES.items():
+        for query, source in submission_sources(model):
+            key = cache_key('admin', 'count', table if source is model else f"{table}-archive", '')
+            cache.set(key, query.order_by(None).count(), ADMIN_COUNT_TTL)
+            refreshed += 1
+    return refreshed
+
+# name -> (function, interval in seconds); functions return the number of rows or items handled
+HOUSEKEEPING_JOBS = {
+    'purge-unverified-users': (purge_unverified_users, int(os.environ.get('PURGE_UNVERIFIED_INTERVAL', 3600))),
+    'compact-tables': (compact_tables, int(os.environ.get('COMPACT_TABLES_INTERVAL', 7 * 86400))),
+    'archive-submissions': (archive_old_submissions, int(os.environ.get('ARCHIVE_SUBMISSIONS_INTERVAL', 86400))),
+    'refresh-caches': (refresh_caches, int(os.environ.get('REFRESH_CACHES_INTERVAL', ADMIN_COUNT_TTL // 2))),
+}
+
+def run_job(name):
+    """Run one housekeeping job with metrics and logging; returns False if it failed."""
+    func, interval = HOUSEKEEPING_JOBS[name]
+    start = time.perf_counter()
+    try:
+        with app.app_context():
+            db.session.info['use_primary'] = True  # jobs act on what they read, so never read stale rows
+            handled = func()
+    except Exception as e:
+        JOB_RUNS.labels(name, 'error').inc()
+        logging.exception('Housekeeping job %s failed: %s', name, e)
+        return False
+    finally:
+        JOB_DURATION.labels(name).observe(time.perf_counter() - start)
+    JOB_RUNS.labels(name, 'ok').inc()
+    logging.info('Housekeeping job %s handled %s in %.2fs', name, handled, time.perf_counter() - start)
+    return True
+
+class SchedulerLock:
+    """The Redis lease that makes one scheduler active; a heartbeat thread keeps it alive."""
+    def __init__(self, ttl=SCHEDULER_LOCK_TTL):
+        self.ttl = ttl
+        self.token = f"{os.uname().nodename}:{os.getpid()}:{random.getrandbits(32)}"
+        self.held = threading.Event()
+        self._stop = threading.Event()
+
+    def acquire(self):
+        try:
+            if redis.set(SCHEDULER_LOCK_KEY, self.token, nx=True, ex=self.ttl):
+                self.held.set()
+                threading.Thread(target=self._heartbeat, name='scheduler-heartbeat', daemon=True).start()
+        except RedisError as e:
+            logging.warning('Scheduler could not reach Redis: %s', e)
+        return self.held.is_set()
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.ttl / 3):
+            try:
+                renewed = redis.eval(RENEW_LOCK_SCRIPT, 1, SCHEDULER_LOCK_KEY, self.token, self.ttl * 1000)
+            except RedisError as e:
+                logging.warning('Scheduler lock renewal failed: %s', e)
+                continue  # keep trying until the lease would have lapsed anyway
+            if not renewed:
+                logging.warning('Scheduler lock lost; standing by')
+                self.held.clear()
+                return
+
+    def release(self):
+        self._stop.set()
+        if self.held.is_set():
+            self.held.clear()
+            try:
+                redis.eval(RELEASE_LOCK_SCRIPT, 1, SCHEDULER_LOCK_KEY, self.token)
+            except RedisError:
+                pass  # the lease expires on its own
+
+def due_jobs():
+    """Names of the jobs whose interval has passed since their last recorded run."""
+    last_runs = redis.hgetall(SCHEDULER_LAST_RUN_KEY)
+    now = time.time()
+    return [name for name, (func, interval) in HOUSEKEEPING_JOBS.items()
+            if now - float(last_runs.get(name.encode(), 0)) >= interval]
+
+@app.cli.command('scheduler')
+def scheduler_command():
+    """Run housekeeping jobs on their intervals while holding the scheduler lock."""
+    stopping = threading.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, lambda *args: stopping.set())
+    lock = SchedulerLock()
+    click.echo(f"Scheduler {lock.token} started with jobs: {', '.join(HOUSEKEEPING_JOBS)}")
+    try:
+        while not stopping.is_set():
+            if lock.held.is_set() or lock.acquire():
+                try:
+                    for name in due_jobs():
+                        if stopping.is_set() or not lock.held.is_set():
+                            break
+                        run_job(name)
+                        # Record failures too, so a broken job retries next interval instead of in a loop
+                        redis.hset(SCHEDULER_LAST_RUN_KEY, name, time.time())
+                except RedisError as e:
+                    logging.warning('Scheduler could not reach Redis: %s', e)
+            stopping.wait(SCHEDULER_POLL_INTERVAL)
+    finally:
+        lock.release()
+
+@app.cli.command('run-job')
+@click.argument('name', type=click.Choice(list(HOUSEKEEPING_JOBS)))
+def run_job_command(name):
+    """Run one housekeeping job now, regardless of its schedule."""
+    sys.exit(0 if run_job(name) else 1)
+
+# Newsletter
+# `flask send-newsletter` mails an HTML file to every Subscription. Subscribers are read in
+# primary-key order, NEWSLETTER_BATCH_SIZE at a time, never all at once. The file is rendered once
+# with placeholder tokens; each recipient's copy only swaps in their address and unsubscribe link.
+# A pool of threads, each keeping one SMTP connection open, sends every batch. Progress is
+# checkpointed in Redis after each send, so an interrupted run (or one stopped by the daily quota)
+# resumes where it left off when rerun with the same campaign name.
+NEWSLETTER_BATCH_SIZE = int(os.environ.get('NEWSLETTER_BATCH_SIZE', 500))
+NEWSLETTER_WORKERS = int(os.environ.get('NEWSLETTER_WORKERS', 4))
+NEWSLETTER_BASE_URL = os.environ.get('NEWSLETTER_BASE_URL', 'https://sojt.infronte.co.uk')
+NEWSLETTER_EMAIL_TOKEN = '__NEWSLETTER_EMAIL__'
+NEWSLETTER_UNSUBSCRIBE_TOKEN = '__NEWSLETTER_UNSUBSCRIBE__'
+NEWSLETTER_SENT = Counter('newsletter_emails_sent_total', 'Newsletter emails sent', ['status'])
+
+def render_newsletter(path):
+    """Render the newsletter once, returning it split into literal text and placeholder tokens."""
+    with open(path) as f:
+        source = f.read()
+    with app.test_request_context(base_url=NEWSLETTER_BASE_URL):
+        html = app.jinja_env.from_string(source).render(
+            current_year=get_current_year(), email=NEWSLETTER_EMAIL_TOKEN, unsubscribe_url=NEWSLETTER_UNSUBSCRIBE_TOKEN)
+    return re.split(f"({NEWSLETTER_EMAIL_TOKEN}|{NEWSLETTER_UNSUBSCRIBE_TOKEN})", html)
+
+def personalize(parts, address, unsubscribe):
+    values = {NEWSLETTER_EMAIL_TOKEN: escape(address), NEWSLETTER_UNSUBSCRIBE_TOKEN: escape(unsubscribe)}
+    return ''.join(values.get(part, part) for part in parts)
+
+class NewsletterSender:
+    """Sends one campaign from a thread pool; each thread reuses its own SMTP connection."""
+    def __init__(self, campaign, subject, parts, workers=NEWSLETTER_WORKERS, throttle=True):
+        self.campaign = campaign
+        self.subject = subject
+        self.parts = parts
+        self.throttle = throttle
+        with app.test_request_context(base_url=NEWSLETTER_BASE_URL):
+            self.unsubscribe_url = url_for('unsubscribe', token=NEWSLETTER_UNSUBSCRIBE_TOKEN, _external=True)
+        self.quota_exhausted = threading.Event()
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='newsletter')
+
+    def key(self, name):
+        return f"newsletter:{self.campaign}:{name}"
+
+    def connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = TracedConnection(mail.state).__enter__()
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    def drop_connection(self):
+        connection = self._local.__dict__.pop('connection', None)
+        if connection is not None and connection.host is not None:
+            try:
+                connection.host.close()
+            except Exception:
+                pass
+
+    def wait_for_tokens(self, quota):
+        """Share the live send buckets with transactional mail; False once the daily quota is spent."""
+        if not self.throttle:
+            return True
+        while (wait := take_send_tokens(app.config['MAIL_DEFAULT_SENDER'])):
+            time.sleep(wait)
+        if not take_daily_quota(quota):
+            self.quota_exhausted.set()
+            return False
+        return True
+
+    def send_one(self, subscriber_id, address):
+        quota = daily_quota_key() if self.throttle else None
+        if self.quota_exhausted.is_set() or not self.wait_for_tokens(quota):
+            return False
+        unsubscribe = self.unsubscribe_url.replace(NEWSLETTER_UNSUBSCRIBE_TOKEN, s.dumps(address, salt='unsubscribe'))
+        msg = Message(self.subject, recipients=[address], sender=app.config['MAIL_DEFAULT_SENDER'],
+                      html=personalize(self.parts, address, unsubscribe),
+                      extra_headers={'List-Unsubscribe': f"<{unsubscribe}>",
+                                     'List-Unsubscribe-Post': 'List-Unsubscribe=One-Click'})
+        with app.app_context():
+            for attempt in range(2):
+                # SMTPException subclasses OSError, so the specific SMTP errors must come first
+                try:
+                    self.connection().send(msg)
+                    break
+                except smtplib.SMTPRecipientsRefused as e:
+                    # One recipient per message, so its refusal is the server's answer
+                    error = smtplib.SMTPResponseException(*next(iter(e.recipients.values())))
+                except smtplib.SMTPResponseException as e:
+                    error = e
+                except smtplib.SMTPServerDisconnected as e:
+                    error = e
+                except smtplib.SMTPException as e:
+                    refund_daily_quota(quota)
+                    return self.fail(address, e)
+                except OSError as e:
+                    error = e
+                if is_quota_error(error):
+                    # Stop the run; this subscriber is not marked sent, so a rerun tomorrow resumes here
+                    logging.warning('Daily send quota reached: %s', error)
+                    refund_daily_quota(quota)
+                    self.quota_exhausted.set()
+                    return False
+                if attempt or (isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500):
+                    refund_daily_quota(quota)
+                    return self.fail(address, error)  # 5xx is permanent; anything else gets one retry
+                self.drop_connection()  # the retry opens a fresh one
+        NEWSLETTER_SENT.labels('sent').inc()
+        redis.sadd(self.key('sent'), subscriber_id)
+        return True
+
+    def fail(self, address, error):
+        NEWSLETTER_SENT.labels('failed').inc()
+        redis.sadd(self.key('failed'), address)
+        logging.warning('Newsletter to %s failed: %s', address, error)
+        return True
+
+    def run(self, batch_size=NEWSLETTER_BATCH_SIZE):
+        """Send to every subscriber past the checkpoint; returns (sent, stopped early)."""
+        cursor = int(redis.get(self.key('cursor')) or 0)
+        total = 0
+        with app.app_context():
+            while not self.quota_exhausted.is_set():
+                batch = (Subscription.query.with_entities(Subscription.id, Subscription.email)
+                         .filter(Subscription.id > cursor).order_by(Subscription.id).limit(batch_size).all())
+                db.session.remove()  # don't hold a connection while the batch is mailed
+                if not batch:
+                    break
+                # Rows already mailed before an interruption, within the current batch
+                done = {int(i) for i in redis.smembers(self.key('sent'))}
+                pending = [row for row in batch if row.id not in done]
+                results = list(self.pool.map(lambda row: self.send_one(row.id, row.email), pending))
+                total += sum(results)
+                if not all(results):
+                    break  # quota ran out part way; the sent set remembers who already got it
+                cursor = batch[-1].id
+                redis.set(self.key('cursor'), cursor)
+                redis.delete(self.key('sent'))
+                click.echo(f"Sent through subscriber {cursor} ({total} this run)")
+        self.close()
+        return total, self.quota_exhausted.is_set()
+
+    def close(self):
+        self.pool.shutdown()
+        for connection in self._connections:
+            try:
+                connection.__exit__(None, None, None)
+            except Exception:
+                pass
+
+@app.cli.command('send-newsletter')
+@click.argument('subject')
+@click.argument('html_file', type=click.Path(exists=True, dir_okay=False))
+@click.option('--campaign', help='Name for checkpointing; rerun with the same name to resume. Defaults to the file name.')
+@click.option('--workers', default=NEWSLETTER_WORKERS, show_default=True, help='Parallel SMTP connections.')
+@click.option('--batch-size', default=NEWSLETTER_BATCH_SIZE, show_default=True, help='Subscribers read per query.')
+@click.option('--no-throttle', is_flag=True, help='Skip the provider rate limits and daily quota, e.g. for a bulk relay.')
+def send_newsletter_command(subject, html_file, campaign, workers, batch_size, no_throttle):
+    """Mail HTML_FILE (a Jinja template; email and unsubscribe_url are available) to all subscribers."""
+    campaign = campaign or os.path.splitext(os.path.basename(html_file))[0]
+    sender = NewsletterSender(campaign, subject, render_newsletter(html_file), workers, throttle=not no_throttle)
+    start = time.perf_counter()
+    sent, stopped = sender.run(batch_size)
+    failed = redis.scard(sender.key('failed'))
+    click.echo(f"Campaign {campaign}: {sent} sent in {time.perf_counter() - start:.1f}s, {failed} failed in total")
+    if stopped:
+        click.echo('Stopped at the daily send quota; rerun the same command to resume.')
+
+@app.route('/unsubscribe/<token>', methods=['GET', 'POST'])
+def unsubscribe(token):
+    """Confirm (GET) and remove (POST) a newsletter subscription via the signed link in each issue."""
+    try:
+        address = s.loads(token, salt='unsubscribe')
+    except Exception:
+        flash('The unsubscribe link is invalid.', 'error')
+        return redirect(url_for('home'))
+    if request.method == 'GET':
+        # Mail scanners and prefetchers follow links, so a GET only asks
+        return render_template('unsubscribe.html', email=address, token=token)
+    Subscription.query.filter_by(email=address).delete()
+    db.session.commit()
+    if request.form.get('List-Unsubscribe') == 'One-Click':  # RFC 8058 one-click POST from the mail client
+        return '', 204
+    flash('You have been unsubscribed from our newsletter.', 'success')
+    return redirect(url_for('home'))
+
+# Template Warm-up
+# Compile every template and render each page once so a fresh worker's first visitors don't pay
+# for it. Rendering touches Redis and the database, so it never runs at import: gunicorn's
+# post_worker_init hook calls it in each worker before it accepts connections, unless
+# TEMPLATE_WARMUP is off. `flask warm-templates` fills JINJA_CACHE_DIR at build time.
+TEMPLATE_WARMUP = os.environ.get('TEMPLATE_WARMUP', 'true').lower() in ('1', 'true', 'yes')
+WARMUP_PAGES = PRERENDER_PAGES + ['contact', 'signup', 'signin', 'forget_password', 'opt_verification']
+
+def warm_templates():
+    """Compile all templates and pre-render the pages; returns the number of templates compiled."""
+    compiled = 0
+    for name in app.jinja_env.list_templates(extensions=['html']):
+        try:
+            app.jinja_env.get_template(name)
+            compiled += 1
+        except Exception as e:
+            logging.warning('Could not compile template %s: %s', name, e)
+    adapter = app.url_map.bind('localhost')
+    for endpoint in WARMUP_PAGES:
+        try:
+            with app.test_request_context(adapter.build(endpoint)):
+                app.view_functions[endpoint]()
+        except Exception as e:
+            logging.warning('Could not pre-render %s: %s', endpoint, e)
+    return compiled
+
+@app.cli.command('warm-templates')
+def warm_templates_command():
+    """Compile every template into JINJA_CACHE_DIR."""
+    click.echo(f"Compiled {warm_templates()} templates")
+
 if __name__ == '__main__':
+    install_profile_signal()
+    if TEMPLATE_WARMUP:
+        warm_templates()
     app.run(debug=False)
\ No newline at end of file
@@ -0,0 +1,349 @@
+"""Load-test and benchmark every route in app.py.
+
+Runs the app in-process against a throwaway SQLite database, a local SMTP sink and an
+in-memory Redis stand-in (fakeredis), so no MySQL, mail server or Redis is needed.
+
+    python bench.py                                          # run and print the results
+    python bench.py --baseline ci.json --update-baseline     # run and store the results as a baseline
+    python bench.py --baseline ci.json                       # run and compare against that baseline
+    python bench.py -c 16 -n 500 -s signin                   # 16 threads, 500 requests, only signin
+
+Latencies depend on the machine, so a baseline only means something on the host that recorded
+it: keep one per benchmark host (e.g. as a CI cache entry) and always name it with --baseline.
+Needs the packages in requirements-dev.txt.
+
+Exits with status 1 when a scenario errors, stores the wrong number of rows, trips a circuit
+breaker or its p95 latency regresses past the tolerance.
+"""
+import argparse
+import json
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Local SMTP sink
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP for smtplib to deliver a message, then discards it."""
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 bench SMTP sink')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.split(None, 1)[0].upper() if line.strip() else b''
+            if command == b'EHLO':
+                self.reply('250-bench')
+                self.reply('250 8BITMIME')
+            elif command == b'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.reply('250 OK')
+            elif command == b'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def start_smtp_sink():
+    server = SMTPSink(('127.0.0.1', 0), SMTPSinkHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+def configure_environment(workdir, smtp_port):
+    """Point the app at the stand-ins; must run before app is imported."""
+    os.environ.update({
+        'DATABASE_URL': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'SECRET_KEY': 'bench-secret',
+        'MAIL_SERVER': '127.0.0.1',
+        'MAIL_PORT': str(smtp_port),
+        'MAIL_USE_TLS': '',
+        'MAIL_USE_SSL': '',
+        'MAIL_USERNAME': '',
+        'MAIL_PASSWORD': '',
+        'MAIL_DEFAULT_SENDER': 'bench@example.com',
+        'NOTIFICATION_EMAIL': 'staff@example.com',
+        'RATELIMIT_STORAGE_URI': 'memory://',
+        'TRACE_SAMPLE_RATE': '0',
+        # Access records and INFO logs would flood the results table and time the log writer instead
+        'LOG_ACCESS': 'false',
+        'LOG_LEVEL': 'WARNING',
+        'SEARCH_INDEX_PATH': os.path.join(workdir, 'search.idx'),
+        # Warmed up in seed(), once Redis points at fakeredis, as gunicorn's post_fork hook would
+        'TEMPLATE_WARMUP': 'false',
+    })
+
+def use_fake_redis(app_module):
+    """Swap the app's Redis client for an instrumented client backed by fakeredis."""
+    try:
+        import fakeredis
+    except ImportError:
+        sys.exit('bench.py needs fakeredis as a Redis stand-in: pip install -r requirements-dev.txt')
+    from redis import ConnectionPool
+    pool = ConnectionPool(connection_class=fakeredis.FakeRedisConnection, server=fakeredis.FakeServer())
+    app_module.redis = app_module.InstrumentedRedis(connection_pool=pool)
+    # Nothing may have reached the real Redis yet, but start from closed breakers regardless
+    for breaker in breakers(app_module):
+        breaker.record_success()
+
+def breakers(app_module):
+    return [app_module.redis_breaker, app_module.smtp_breaker, app_module.db_breaker]
+
+def opened_breakers(app_module):
+    """Names of the breakers that opened at any point during the run."""
+    from prometheus_client import REGISTRY
+    return [breaker.name for breaker in breakers(app_module)
+            if REGISTRY.get_sample_value('circuit_breaker_transitions_total',
+                                         {'dependency': breaker.name, 'state': 'open'})]
+
+
+# Scenarios
+# Each scenario is (expected status, request function). Request functions get a test client and a
+# unique integer so form submissions never collide on unique columns. Scenarios that store rows
+# also have a check: (model, column, LIKE pattern, expected rows given the number of requests).
+PAGES = ['/', '/about', '/contact', '/privacy', '/terms', '/careers', '/programs', '/questions',
+         '/signup', '/signin', '/forget-password', '/opt-verification']
+
+def build_scenarios(app_module):
+    serializer = app_module.s
+    password = 'bench-password'
+
+    def page(path):
+        return lambda client, i: client.get(path)
+
+    def subscribe(client, i):
+        return client.post('/subscribe', data={'subscribeEmail': f"sub{i}@example.com"})
+
+    def schedule_call(client, i):
+        return client.post('/schedule-call', data={
+            'ServiceFirstnameInput': 'Bench', 'serviceLastnameInput': f"Caller{i}",
+            'serviceEmailInput': f"call{i}@example.com", 'servieTextarea': 'Please call me back.'})
+
+    def submit_contact(client, i):
+        return client.post('/submit_contact', data={
+            'contactFirstNameInput': 'Bench', 'contactLastNameInput': f"Contact{i}",
+            'contactEmailInput': f"contact{i}@example.com", 'contactCompanyNameInput': 'Bench Ltd',
+            'contactPhoneInput': '0123456789', 'contactTextarea': 'Tell me about the programs.'})
+
+    def submit_contact_repeat(client, i):
+        # Double-clicks and retries: the same form and idempotency key over and over
+        return client.post('/submit_contact', data={
+            'contactFirstNameInput': 'Bench', 'contactLastNameInput': 'Repeat',
+            'contactEmailInput': 'repeat@example.com', 'contactCompanyNameInput': 'Bench Ltd',
+            'contactPhoneInput': '0123456789', 'contactTextarea': 'Tell me about the programs.',
+            'idempotency_key': 'bench-repeat'})
+
+    def signup(client, i):
+        return client.post('/signup', data={
+            'signupEmailInput': f"signup{i}@example.com", 'formSignUpPassword': password,
+            'formSignUpConfirmPassword': password, 'signupCheckTextCheckbox': 'on'})
+
+    def confirm_email(client, i):
+        return client.get(f"/confirm/{serializer.dumps('bench-user@example.com', salt='email-confirm')}")
+
+    def signin(client, i):
+        return client.post('/signin', data={'signinEmailInput': 'bench-user@example.com', 'formSignUpPassword': password})
+
+    def signin_unknown(client, i):
+        return client.post('/signin', data={'signinEmailInput': f"nobody{i}@example.com", 'formSignUpPassword': password})
+
+    def forget_password(client, i):
+        return client.post('/forget-password', data={'forgetEmailInput2': 'bench-user@example.com'})
+
+    def reset_form(client, i):
+        return client.get(f"/reset/{serializer.dumps('bench-user@example.com', salt='password-reset')}")
+
+    def reset_password(client, i):
+        return client.post(f"/reset/{serializer.dumps('bench-user@example.com', salt='password-reset')}",
+                           data={'newPassword': password})
+
+    scenarios = {f"GET {path}": (200, page(path)) for path in PAGES}
+    scenarios.update({
+        'GET 404': (404, page('/does-not-exist')),
+        'GET /search': (200, page('/search?q=cloud eng')),
+        'POST /subscribe': (302, subscribe),
+        'POST /schedule-call': (302, schedule_call),
+        'POST /submit_contact': (302, submit_contact),
+        'POST /submit_contact (repeat)': (302, submit_contact_repeat),
+        'POST /signup': (302, signup),
+        'GET /confirm/<token>': (302, confirm_email),
+        'POST /signin': (302, signin),
+        'POST /signin (unknown email)': (302, signin_unknown),
+        'POST /forget-password': (302, forget_password),
+        'GET /reset/<token>': (200, reset_form),
+        'POST /reset/<token>': (302, reset_password),
+    })
+    return scenarios
+
+def build_row_checks(app_module):
+    m = app_module
+    every = lambda total: total
+    return {
+        'POST /subscribe': (m.Subscription, m.Subscription.email, 'sub%@example.com', every),
+        'POST /schedule-call': (m.ScheduledCall, m.ScheduledCall.email, 'call%@example.com', every),
+        'POST /submit_contact': (m.ContactSubmission, m.ContactSubmission.email, 'contact%@example.com', every),
+        # Every repeat carries the same idempotency key, so only the first may be stored
+        'POST /submit_contact (repeat)': (m.ContactSubmission, m.ContactSubmission.email, 'repeat@example.com',
+                                          lambda total: 1),
+        'POST /signup': (m.User, m.User.email, 'signup%@example.com', every),
+    }
+
+def check_rows(app_module, check, total):
+    """Return (stored, expected) rows for a scenario's check."""
+    model, column, pattern, expected = check
+    with app_module.app.app_context():
+        return model.query.filter(column.like(pattern)).count(), expected(total)
+
+def seed(app_module):
+    """Create the verified account the signin and reset scenarios use, and build the search index."""
+    from werkzeug.security import generate_password_hash
+    with app_module.app.app_context():
+        app_module.db.drop_all()
+        app_module.db.create_all()
+        app_module.db.session.add(app_module.User(email='bench-user@example.com',
+                                                  password=generate_password_hash('bench-password'),
+                                                  is_verified=True))
+        app_module.db.session.commit()
+    app_module.build_search_index()
+    app_module.warm_templates()
+
+
+# Measurement
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def run_scenario(app_module, expected_status, func, requests, concurrency, warmup):
+    """Drive one scenario and return its throughput, latency percentiles and error count."""
+    local = threading.local()
+    counter = iter(range(10 ** 9))
+    lock = threading.Lock()
+
+    def one_request(_):
+        if not hasattr(local, 'client'):
+            local.client = app_module.app.test_client()
+        with lock:
+            i = next(counter)
+        start = time.perf_counter()
+        response = func(local.client, i)
+        elapsed = time.perf_counter() - start
+        return elapsed, response.status_code == expected_status
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one_request, range(warmup)))
+        started = time.perf_counter()
+        results = list(pool.map(one_request, range(requests)))
+        wall = time.perf_counter() - started
+
+    latencies = sorted(elapsed for elapsed, ok in results)
+    return {
+        'requests': requests,
+        'errors': sum(1 for elapsed, ok in results if not ok),
+        'throughput': requests / wall if wall else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Return the scenarios whose p95 regressed past the tolerance and the noise floor."""
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        allowed = max(previous['p95_ms'] * (1 + tolerance), previous['p95_ms'] + min_delta_ms)
+        if result['p95_ms'] > allowed:
+            regressions.append((name, previous['p95_ms'], result['p95_ms']))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help='worker threads per scenario')
+    parser.add_argument('-n', '--requests', type=int, default=100, help='measured requests per scenario')
+    parser.add_argument('-w', '--warmup', type=int, default=10, help='unmeasured requests per scenario')
+    parser.add_argument('-s', '--scenario', action='append', help='only run scenarios containing this text')
+    parser.add_argument('--baseline', help='baseline JSON for this host to compare against (or write)')
+    parser.add_argument('--update-baseline', action='store_true', help='store these results in --baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 slowdown, as a fraction')
+    parser.add_argument('--min-delta-ms', type=float, default=2.0, help='ignore p95 changes smaller than this')
+    args = parser.parse_args()
+    if args.update_baseline and not args.baseline:
+        parser.error('--update-baseline needs --baseline FILE')
+    if args.baseline and not args.update_baseline and not os.path.exists(args.baseline):
+        parser.error(f"no baseline at {args.baseline}; record one on this host with --update-baseline")
+
+    workdir = tempfile.mkdtemp(prefix='sojt-bench-')
+    configure_environment(workdir, start_smtp_sink())
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as app_module
+    use_fake_redis(app_module)
+    seed(app_module)
+
+    scenarios = build_scenarios(app_module)
+    row_checks = build_row_checks(app_module)
+    if args.scenario:
+        scenarios = {name: s for name, s in scenarios.items() if any(text in name for text in args.scenario)}
+
+    results = {}
+    print(f"{'scenario':<32} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}")
+    for name, (expected_status, func) in scenarios.items():
+        result = run_scenario(app_module, expected_status, func, args.requests, args.concurrency, args.warmup)
+        results[name] = result
+        print(f"{name:<32} {result['throughput']:>9.1f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+              f"{result['p99_ms']:>9.2f} {result['errors']:>7}")
+
+    failed = False
+    errored = [name for name, result in results.items() if result['errors']]
+    if errored:
+        failed = True
+        print(f"\nScenarios returned unexpected status codes: {', '.join(errored)}")
+    for name in results:
+        if name in row_checks:
+            stored, expected = check_rows(app_module, row_checks[name], args.warmup + args.requests)
+            if stored != expected:
+                failed = True
+                print(f"{name}: stored {stored} rows, expected {expected}")
+    opened = opened_breakers(app_module)
+    if opened:
+        failed = True
+        print(f"\nCircuit breakers opened during the run, so results reflect degraded mode: {', '.join(opened)}")
+
+    if args.update_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: p95 {before:.2f} ms -> {after:.2f} ms")
+        failed = failed or bool(regressions)
+        if not regressions:
+            print(f"\nNo p95 regressions against {args.baseline}")
+    else:
+        print('\nNo --baseline given, so p95 latencies were not compared')
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
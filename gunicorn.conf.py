@@ -0,0 +1,34 @@
+# Gunicorn settings for the SOJT app
+import glob
+import os
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    """Clear metrics left behind by a previous master so counters start from zero."""
+    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, '*.db')):
+            os.remove(path)
+
+
+def child_exit(server, worker):
+    """Drop a dead worker's live gauges from the shared metrics directory."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    """Start the app's background threads in each worker; threads do not survive the fork."""
+    from app import start_background_threads
+    start_background_threads()
+
+
+def post_worker_init(worker):
+    """Let `kill -USR2 <worker pid>` start a sampling profile in that worker, then warm its templates."""
+    from app import TEMPLATE_WARMUP, install_profile_signal, warm_templates
+    install_profile_signal()
+    if TEMPLATE_WARMUP:
+        warm_templates()
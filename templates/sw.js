@@ -0,0 +1,96 @@
+{% if enabled -%}
+// Generated by app.py from the asset manifest; the version changes whenever a precached file does.
+var VERSION = {{ version|tojson }};
+var SHELL_CACHE = "shell-" + VERSION;
+var PAGE_CACHE = "pages-" + VERSION;
+var ASSET_CACHE = "assets-" + VERSION;
+var PRECACHE_ASSETS = {{ assets|tojson }};
+var PRECACHE_PAGES = {{ pages|tojson }};
+var CACHEABLE_PAGES = {{ cacheable_pages|tojson }};
+var STATIC_PREFIX = {{ static_prefix|tojson }};
+var OFFLINE_PAGE = {{ offline_page|tojson }};
+var ASSET_LIMIT = {{ asset_limit|tojson }};
+
+// Stylesheets load their fonts by plain URL; map those to the fingerprinted copies we precache
+var FINGERPRINTED = {};
+PRECACHE_ASSETS.forEach(function (asset) { FINGERPRINTED[asset.split("?")[0]] = asset; });
+
+self.addEventListener("install", function (event) {
+   event.waitUntil(Promise.all([
+      caches.open(SHELL_CACHE).then(function (cache) { return cache.addAll(PRECACHE_ASSETS); }),
+      caches.open(PAGE_CACHE).then(function (cache) { return cache.addAll(PRECACHE_PAGES); })
+   ]).then(function () { return self.skipWaiting(); }));
+});
+
+self.addEventListener("activate", function (event) {
+   var current = [SHELL_CACHE, PAGE_CACHE, ASSET_CACHE];
+   event.waitUntil(caches.keys().then(function (names) {
+      return Promise.all(names.filter(function (name) { return current.indexOf(name) === -1; })
+         .map(function (name) { return caches.delete(name); }));
+   }).then(function () { return self.clients.claim(); }));
+});
+
+function trimCache(cache) {
+   return cache.keys().then(function (keys) {
+      return Promise.all(keys.slice(0, Math.max(0, keys.length - ASSET_LIMIT))
+         .map(function (key) { return cache.delete(key); }));
+   });
+}
+
+// Fingerprinted URLs never change content, so any cached copy is current
+function cacheFirst(request) {
+   return caches.match(request).then(function (cached) {
+      return cached || fetch(request).then(function (response) {
+         if (response.ok) {
+            var copy = response.clone();
+            caches.open(ASSET_CACHE).then(function (cache) {
+               return cache.put(request, copy).then(function () { return trimCache(cache); });
+            });
+         }
+         return response;
+      });
+   });
+}
+
+// Answer from the cache at once and refresh it in the background; only responses the server
+// marked public (the shared page shell) are stored
+function staleWhileRevalidate(event, path) {
+   var refresh = fetch(event.request).then(function (response) {
+      var cacheControl = response.headers.get("Cache-Control") || "";
+      if (response.ok && !response.redirected && cacheControl.indexOf("public") !== -1) {
+         var copy = response.clone();
+         caches.open(PAGE_CACHE).then(function (cache) { return cache.put(path, copy); });
+      }
+      return response;
+   });
+   event.waitUntil(refresh.catch(function () {}));
+   return caches.open(PAGE_CACHE).then(function (cache) {
+      return cache.match(path).then(function (cached) {
+         return cached || refresh.catch(function () { return cache.match(OFFLINE_PAGE); });
+      });
+   });
+}
+
+self.addEventListener("fetch", function (event) {
+   var request = event.request;
+   var url = new URL(request.url);
+   if (request.method !== "GET" || url.origin !== self.location.origin) {
+      return;
+   }
+   if (url.pathname.indexOf(STATIC_PREFIX) === 0 && url.searchParams.has("v")) {
+      event.respondWith(cacheFirst(request));
+   } else if (!url.search && FINGERPRINTED.hasOwnProperty(url.pathname)) {
+      event.respondWith(cacheFirst(FINGERPRINTED[url.pathname]));
+   } else if (request.mode === "navigate" && !url.search && CACHEABLE_PAGES.indexOf(url.pathname) !== -1) {
+      event.respondWith(staleWhileRevalidate(event, url.pathname));
+   }
+});
+{%- else -%}
+// The service worker is switched off: clear its caches and unregister.
+self.addEventListener("install", function () { self.skipWaiting(); });
+self.addEventListener("activate", function (event) {
+   event.waitUntil(caches.keys().then(function (names) {
+      return Promise.all(names.map(function (name) { return caches.delete(name); }));
+   }).then(function () { return self.registration.unregister(); }));
+});
+{%- endif %}
@@ -0,0 +1,62 @@
+"""Run the app in-process against SQLite files and fakeredis, with no background loops."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+WORKDIR = tempfile.mkdtemp(prefix='sojt-tests-')
+
+# app.py reads its configuration at import, so this must come first
+os.environ.update({
+    'DATABASE_URL': f"sqlite:///{os.path.join(WORKDIR, 'primary.db')}",
+    'DATABASE_REPLICA_URLS': f"sqlite:///{os.path.join(WORKDIR, 'replica.db')}",
+    'SECRET_KEY': 'test-secret',
+    'MAIL_DELIVERY': 'worker',
+    'MAIL_DEFAULT_SENDER': 'tests@example.com',
+    'NOTIFICATION_EMAIL': 'staff@example.com',
+    'RATELIMIT_STORAGE_URI': 'memory://',
+    'TRACE_SAMPLE_RATE': '0',
+    'TRACE_EXPORT_PATH': os.path.join(WORKDIR, 'traces.jsonl'),
+    'PROFILE_DIR': os.path.join(WORKDIR, 'profiles'),
+    'SEARCH_INDEX_PATH': os.path.join(WORKDIR, 'search.idx'),
+    'TEMPLATE_WARMUP': 'false',
+    'LOG_LEVEL': 'CRITICAL',
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app as sojt  # noqa: E402
+import fakeredis  # noqa: E402
+from redis import ConnectionPool  # noqa: E402
+
+# Tests drive replica health and the caches themselves; only the log writer runs in the background
+sojt.background_thread_pids.update({name: os.getpid() for name in sojt.background_threads if name != 'log-writer'})
+
+with sojt.app.app_context():
+    sojt.db.metadata.create_all(sojt.db.engines['replica0'])
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def app_module(monkeypatch, redis_server):
+    """The app module with a fresh fakeredis, closed breakers and every replica healthy."""
+    pool = ConnectionPool(connection_class=fakeredis.FakeRedisConnection, server=redis_server)
+    monkeypatch.setattr(sojt, 'redis', sojt.InstrumentedRedis(connection_pool=pool))
+    monkeypatch.setattr(sojt, 'redis_breaker', sojt.CircuitBreaker('redis', sojt.RedisCircuitOpen))
+    monkeypatch.setattr(sojt, 'smtp_breaker', sojt.CircuitBreaker('smtp', sojt.SMTPCircuitOpen))
+    monkeypatch.setattr(sojt, 'db_breaker', sojt.CircuitBreaker('database', sojt.DatabaseCircuitOpen))
+    monkeypatch.setattr(sojt, 'replica_health', {bind: True for bind in sojt.REPLICA_BINDS})
+    sojt.local_cache.clear()
+    yield sojt
+    with sojt.app.app_context():
+        for engine in sojt.db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
@@ -0,0 +1,79 @@
+import uuid
+
+import pytest
+from flask import template_rendered
+
+
+@pytest.fixture
+def admin_client(app_module, client, monkeypatch):
+    """A client signed in as a verified staff account, reading from the primary."""
+    email = f"admin-{uuid.uuid4().hex}@example.com"
+    with app_module.app.app_context():
+        user = app_module.User(email=email, password='x', is_verified=True)
+        app_module.db.session.add(user)
+        app_module.db.session.commit()
+        user_id = user.id
+    monkeypatch.setattr(app_module, 'admin_emails', {email})
+    monkeypatch.setattr(app_module, 'ADMIN_PAGE_SIZE', 3)
+    app_module.replica_health['replica0'] = False  # the test replica never receives these rows
+    with client.session_transaction() as session:
+        session['user_id'] = user_id
+    return client
+
+
+@pytest.fixture
+def subscribers(app_module):
+    """Seven subscriptions sharing a unique prefix, oldest first."""
+    prefix = uuid.uuid4().hex[:12]
+    emails = [f"{prefix}-{i}@example.com" for i in range(7)]
+    with app_module.app.app_context():
+        app_module.db.session.add_all(app_module.Subscription(email=email) for email in emails)
+        app_module.db.session.commit()
+    return prefix, emails
+
+
+def listing(app_module, client, **params):
+    pages = []
+
+    def record(sender, template, context, **extra):
+        pages.append(context)
+
+    with template_rendered.connected_to(record, app_module.app):
+        assert client.get('/admin/subscriptions', query_string=params).status_code == 200
+    page = pages[0]
+    return [row.email for row in page['rows']], page
+
+
+def test_pages_walk_newest_first_by_keyset(app_module, admin_client, subscribers):
+    prefix, emails = subscribers
+    first, page = listing(app_module, admin_client, q=prefix)
+    assert first == emails[:-4:-1]
+    assert page['total'] == 7
+    assert page['newer_cursor'] is None
+    second, page = listing(app_module, admin_client, q=prefix, after=page['older_cursor'])
+    assert second == emails[3:0:-1]
+    third, page = listing(app_module, admin_client, q=prefix, after=page['older_cursor'])
+    assert third == emails[:1]
+    assert page['older_cursor'] is None
+
+
+def test_newer_cursor_returns_to_the_previous_page(app_module, admin_client, subscribers):
+    prefix, emails = subscribers
+    first, page = listing(app_module, admin_client, q=prefix)
+    second, page = listing(app_module, admin_client, q=prefix, after=page['older_cursor'])
+    back, page = listing(app_module, admin_client, q=prefix, before=page['newer_cursor'])
+    assert back == first
+    assert page['newer_cursor'] is None
+    assert page['older_cursor'] is not None
+
+
+def test_search_is_a_literal_prefix_match(app_module, admin_client, subscribers):
+    prefix, emails = subscribers
+    assert listing(app_module, admin_client, q=f"{prefix}-6")[0] == [emails[6]]
+    assert listing(app_module, admin_client, q=f"{prefix}%")[0] == []  # LIKE wildcards are escaped
+
+
+def test_non_staff_are_sent_to_sign_in(app_module, client):
+    response = client.get('/admin/subscriptions')
+    assert response.status_code == 302
+    assert response.location.endswith('/signin')
@@ -0,0 +1,57 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def db_session(app_module):
+    with app_module.app.app_context():
+        app_module.db.session.info['use_primary'] = True  # the test replica never receives these rows
+        yield app_module.db.session
+
+
+def add_call(app_module, session, created_at, email):
+    call = app_module.ScheduledCall(first_name='Ada', last_name='Lovelace', email=email, message='Hello')
+    session.add(call)
+    session.flush()
+    call.created_at = created_at
+    session.commit()
+    return call.id
+
+
+def test_old_and_legacy_rows_move_to_the_archive_and_read_back(app_module, db_session):
+    prefix = uuid.uuid4().hex
+    old = datetime.now() - timedelta(days=app_module.SUBMISSION_RETENTION_DAYS + 1)
+    old_id = add_call(app_module, db_session, old, f"{prefix}-old@example.com")
+    legacy_id = add_call(app_module, db_session, None, f"{prefix}-legacy@example.com")
+    fresh_id = add_call(app_module, db_session, datetime.now(), f"{prefix}-fresh@example.com")
+
+    app_module.archive_old_submissions()
+
+    hot = {row.id for row in app_module.ScheduledCall.query.filter(app_module.ScheduledCall.email.startswith(prefix))}
+    archived = {row.id: row for row in app_module.ScheduledCallArchive.query.filter(
+        app_module.ScheduledCallArchive.email.startswith(prefix))}
+    assert hot == {fresh_id}
+    assert set(archived) == {old_id, legacy_id}
+    assert archived[legacy_id].created_at is not None  # ages out of the archive from when it was moved
+
+    restored = app_module.unarchive_row(archived[old_id])
+    assert isinstance(restored, app_module.ScheduledCall)
+    assert (restored.id, restored.email, restored.message, restored.created_at) == \
+        (old_id, f"{prefix}-old@example.com", 'Hello', old)
+
+
+def test_search_spans_hot_and_archived_rows(app_module, db_session):
+    prefix = uuid.uuid4().hex
+    old = datetime.now() - timedelta(days=app_module.SUBMISSION_RETENTION_DAYS + 1)
+    ids = [add_call(app_module, db_session, old if i < 3 else datetime.now(), f"{prefix}-{i}@example.com")
+           for i in range(6)]
+    app_module.archive_old_submissions()
+
+    found = app_module.search_submissions(app_module.ScheduledCall, ['email'], prefix, limit=4)
+    assert [row.id for row in found] == ids[::-1][:4]
+    rest = app_module.search_submissions(app_module.ScheduledCall, ['email'], prefix, after=found[-1].id, limit=4)
+    assert [row.id for row in rest] == ids[1::-1]
+    back = app_module.search_submissions(app_module.ScheduledCall, ['email'], prefix, before=rest[0].id, limit=4)
+    assert [row.id for row in back] == ids[2:6]
@@ -0,0 +1,136 @@
+import sqlite3
+
+import pytest
+from sqlalchemy import event
+
+
+@pytest.fixture
+def breaker(app_module):
+    return app_module.CircuitBreaker('test', app_module.DatabaseCircuitOpen, failure_threshold=3, reset_timeout=30)
+
+
+@pytest.fixture
+def primary_down(app_module):
+    """Make every new connection to the primary fail; returns the list of connect attempts."""
+    attempts = []
+
+    def refuse(*args):
+        attempts.append(args)
+        raise sqlite3.OperationalError('unable to open database file')
+
+    engine = app_module.primary_engine
+    engine.dispose()
+    event.listen(engine, 'do_connect', refuse)
+    yield attempts
+    event.remove(engine, 'do_connect', refuse)
+    engine.dispose()
+
+
+def test_opens_after_consecutive_failures(app_module, breaker):
+    for _ in range(2):
+        breaker.record_failure()
+        breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    with pytest.raises(app_module.DatabaseCircuitOpen):
+        breaker.before_call()
+
+
+def test_success_resets_the_failure_run(breaker):
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == breaker.CLOSED
+    breaker.before_call()
+
+
+def test_half_open_trial_closes_or_reopens(app_module, breaker):
+    for _ in range(3):
+        breaker.record_failure()
+    breaker.opened_at -= breaker.reset_timeout
+    breaker.before_call()  # the trial call
+    assert breaker.state == breaker.HALF_OPEN
+    breaker.record_failure()
+    assert breaker.state == breaker.OPEN
+    with pytest.raises(app_module.DatabaseCircuitOpen):
+        breaker.before_call()
+
+    breaker.opened_at -= breaker.reset_timeout
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == breaker.CLOSED
+    assert breaker.failures == 0
+
+
+def test_open_circuit_errors_are_client_connection_errors(app_module):
+    from redis.exceptions import ConnectionError as RedisConnectionError
+    import smtplib
+    assert issubclass(app_module.RedisCircuitOpen, RedisConnectionError)
+    assert issubclass(app_module.SMTPCircuitOpen, smtplib.SMTPServerDisconnected)
+
+
+def test_database_breaker_stops_connecting_once_open(app_module, client, primary_down):
+    threshold = app_module.db_breaker.failure_threshold
+    statuses = []
+    for i in range(threshold + 3):
+        response = client.post('/schedule-call', data={
+            'ServiceFirstnameInput': 'Ada', 'serviceLastnameInput': 'Lovelace',
+            'serviceEmailInput': f"ada{i}@example.com", 'servieTextarea': 'Hello'})
+        statuses.append(response.status_code)
+    assert app_module.db_breaker.state == app_module.db_breaker.OPEN
+    assert statuses == [500] * threshold + [302] * 3
+    # Checked before the pool checkout, so requests after the breaker opened never tried to connect
+    assert len(primary_down) == threshold
+
+
+def test_database_breaker_answers_reads_with_503(app_module, primary_down):
+    for _ in range(app_module.db_breaker.failure_threshold):
+        app_module.db_breaker.record_failure()
+    with app_module.app.test_request_context('/'):
+        app_module.db.session.info['use_primary'] = True
+        with pytest.raises(app_module.DatabaseCircuitOpen):
+            app_module.User.query.count()
+        response = app_module.app.handle_user_exception(app_module.DatabaseCircuitOpen('database circuit open'))
+        assert response.status_code == 503
+        assert response.headers['Retry-After']
+    assert not primary_down
+
+
+@pytest.fixture
+def failing_queries(app_module):
+    """Make every query on the primary raise the given MySQL-style error number."""
+    errors = []
+
+    def fail(cursor, statement, parameters, context):
+        raise sqlite3.OperationalError(*errors[-1])
+
+    event.listen(app_module.primary_engine, 'do_execute', fail)
+    yield errors
+    event.remove(app_module.primary_engine, 'do_execute', fail)
+
+
+def query_primary(app_module):
+    with app_module.app.app_context():
+        app_module.db.session.info['use_primary'] = True
+        with pytest.raises(app_module.OperationalError):
+            app_module.User.query.count()
+
+
+@pytest.mark.parametrize('error', [(1213, 'Deadlock found when trying to get lock'),
+                                   (1205, 'Lock wait timeout exceeded'),
+                                   ('database is locked',)])
+def test_contention_errors_never_trip_the_database_breaker(app_module, failing_queries, error):
+    failing_queries.append(error)
+    for _ in range(app_module.db_breaker.failure_threshold + 1):
+        query_primary(app_module)
+    assert app_module.db_breaker.state == app_module.db_breaker.CLOSED
+    assert app_module.db_breaker.failures == 0
+
+
+def test_lost_connections_trip_the_database_breaker(app_module, failing_queries):
+    failing_queries.append((2013, 'Lost connection to MySQL server during query'))
+    for _ in range(app_module.db_breaker.failure_threshold):
+        query_primary(app_module)
+    assert app_module.db_breaker.state == app_module.db_breaker.OPEN
@@ -0,0 +1,112 @@
+import math
+import pickle
+import threading
+import time
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def key():
+    return f"test:{uuid.uuid4().hex}"
+
+
+def counting(value, calls, delay=0.0):
+    def compute():
+        calls.append(1)
+        time.sleep(delay)
+        return value
+    return compute
+
+
+def test_local_cache_evicts_least_recently_used_and_expires(app_module):
+    local = app_module.LocalCache(2, name='test')
+    now = time.time()
+    local.set('a', app_module.CacheEntry(1, now + 60))
+    local.set('b', app_module.CacheEntry(2, now + 60))
+    local.get('a')
+    local.set('c', app_module.CacheEntry(3, now + 60))
+    assert local.get('b') is None
+    assert local.get('a').value == 1
+    local.set('d', app_module.CacheEntry(4, now - 1))
+    assert local.get('d') is None
+
+
+def test_redis_tier_stores_json_and_ignores_unreadable_entries(app_module, key):
+    app_module.cache.set(key, [b'<p>page</p>', 'text/html'], local=False)
+    raw = app_module.redis.get(app_module.CACHE_PREFIX + key)
+    assert raw.startswith(b'[[{"__bytes__"')
+    assert app_module.cache.get(key, local=False) == [b'<p>page</p>', 'text/html']
+    app_module.redis.set(app_module.CACHE_PREFIX + key, pickle.dumps(([1], time.time() + 60, 0.0)))
+    assert app_module.cache.get(key, 'missing', local=False) == 'missing'
+
+
+def test_get_or_compute_fills_both_tiers_once(app_module, key):
+    calls = []
+    assert app_module.cache.get_or_compute(key, counting('v', calls)) == 'v'
+    assert app_module.cache.get_or_compute(key, counting('v', calls)) == 'v'
+    assert len(calls) == 1
+    app_module.local_cache.clear()
+    assert app_module.cache.get_or_compute(key, counting('v', calls)) == 'v'  # from Redis
+    assert len(calls) == 1
+    assert app_module.local_cache.get(key).value == 'v'
+
+
+def test_local_false_never_touches_the_local_tier(app_module, key):
+    app_module.cache.get_or_compute(key, lambda: 'v', local=False)
+    assert app_module.local_cache.get(key) is None
+    assert app_module.cache.get(key, local=False) == 'v'
+
+
+def test_xfetch_refreshes_early_in_proportion_to_compute_cost(app_module, monkeypatch):
+    now = time.time()
+    entry = app_module.CacheEntry('v', now + 5, delta=1.0)
+    monkeypatch.setattr(app_module.random, 'random', lambda: 0.999)
+    assert not app_module.cache._refresh_early(entry)
+    monkeypatch.setattr(app_module.random, 'random', lambda: math.exp(-10))  # -log(r) = 10 > 5s left
+    assert app_module.cache._refresh_early(entry)
+    cheap = app_module.CacheEntry('v', now + 5, delta=0.0)
+    assert not app_module.cache._refresh_early(cheap)
+
+
+def test_early_refresh_recomputes_before_expiry(app_module, key, monkeypatch):
+    app_module.cache.set(key, 'old', ttl=5, delta=1.0)
+    monkeypatch.setattr(app_module.random, 'random', lambda: math.exp(-10))
+    assert app_module.cache.get_or_compute(key, lambda: 'new') == 'new'
+    assert app_module.cache.get(key) == 'new'
+
+
+def test_concurrent_misses_for_one_key_compute_once(app_module, key):
+    calls, results = [], []
+    threads = [threading.Thread(target=lambda: results.append(
+        app_module.cache.get_or_compute(key, counting('v', calls, delay=0.2)))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == ['v'] * 5
+    assert len(calls) == 1
+
+
+def test_a_slow_key_never_blocks_other_keys(app_module, key):
+    # Another process holds the compute lock, so this process polls Redis for the value
+    assert app_module.cache.remote.acquire(key, 5)
+    waiter = threading.Thread(target=lambda: app_module.cache.get_or_compute(key, lambda: 'mine'))
+    waiter.start()
+    time.sleep(0.1)
+    start = time.perf_counter()
+    for i in range(500):
+        assert app_module.cache.get_or_compute(f"{key}:{i}", lambda: i) == i
+    assert time.perf_counter() - start < 3  # a blocked stripe would stall for CACHE_LOCK_TIMEOUT (5s)
+    assert waiter.is_alive()
+    app_module.cache.set(key, 'theirs')
+    waiter.join(2)
+    assert not waiter.is_alive()
+
+
+def test_cached_views_ignore_unlisted_query_strings(app_module, client):
+    for query in ('', '?utm_source=a', '?x=1&y=2'):
+        assert client.get(f"/about{query}").status_code == 200
+    keys = [k for k in app_module.redis.scan_iter(f"{app_module.CACHE_PREFIX}view:*") if b'/about' in k]
+    assert len(keys) == 1
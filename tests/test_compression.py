@@ -0,0 +1,57 @@
+import gzip
+
+from flask import Response
+
+
+def test_minify_collapses_text_between_tags_only(app_module):
+    html = ('<div   class="a  b">\n\n  <a title="Two  spaces\n here" data-x=\'1 > 0\'>Hello    there</a>\n'
+            '<pre>  keep\n   this </pre> <!-- gone -->  </div>')
+    assert app_module.minify_html(html) == (
+        '<div   class="a  b"> <a title="Two  spaces\n here" data-x=\'1 > 0\'>Hello there</a> '
+        '<pre>  keep\n   this </pre> </div>')
+
+
+def test_minify_leaves_form_values_alone(app_module):
+    html = '<input value="a   b"><textarea>  x\n\n y </textarea>'
+    assert app_module.minify_html(html) == html
+
+
+def test_pages_are_compressed_for_the_best_accepted_encoding(app_module, client):
+    plain = client.get('/about', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Vary'] == 'Accept-Encoding'
+    gzipped = client.get('/about', headers={'Accept-Encoding': 'gzip'})
+    assert gzipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(gzipped.data) == plain.data
+    if app_module.brotli is not None:
+        assert client.get('/about', headers={'Accept-Encoding': 'gzip, br'}).headers['Content-Encoding'] == 'br'
+
+
+def test_streamed_bodies_are_gzipped_only_for_gzip_clients(app_module):
+    for accept, expected in (('gzip', 'gzip'), ('br', None), ('identity', None)):
+        with app_module.app.test_request_context('/', headers={'Accept-Encoding': accept}):
+            response = Response(iter([b'<p>one</p>', '<p>two</p>']), mimetype='text/html')
+            response = app_module.minify_and_compress(response)
+            body = b''.join(response.iter_encoded())
+            assert response.headers.get('Content-Encoding') == expected
+            assert (gzip.decompress(body) if expected else body) == b'<p>one</p><p>two</p>'
+            assert 'Accept-Encoding' in response.vary
+
+
+def test_rewritten_bodies_get_a_weak_etag(app_module):
+    with app_module.app.test_request_context('/', headers={'Accept-Encoding': 'gzip'}):
+        response = Response('<p>  hello  </p>' * 200, mimetype='text/html')
+        response.set_etag('abc')
+        response = app_module.minify_and_compress(response)
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.get_etag() == ('abc', True)
+
+
+def test_service_worker_revalidates_with_304_across_encodings(client):
+    first = client.get('/sw.js', headers={'Accept-Encoding': 'br, gzip'})
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+    for accept in ('gzip', 'identity'):
+        again = client.get('/sw.js', headers={'Accept-Encoding': accept, 'If-None-Match': etag})
+        assert again.status_code == 304
+        assert not again.data
@@ -0,0 +1,30 @@
+import uuid
+from datetime import datetime, timedelta
+
+
+def add_user(app_module, created_at, is_verified=False):
+    email = f"{uuid.uuid4().hex}@example.com"
+    user = app_module.User(email=email, password='x', is_verified=is_verified)
+    app_module.db.session.add(user)
+    app_module.db.session.flush()
+    user.created_at = created_at
+    app_module.db.session.commit()
+    return email
+
+
+def remaining(app_module, *emails):
+    app_module.db.session.info['use_primary'] = True
+    return {user.email for user in app_module.User.query.filter(app_module.User.email.in_(emails))}
+
+
+def test_purge_removes_only_stale_unverified_users(app_module):
+    old = datetime.now() - timedelta(days=app_module.UNVERIFIED_USER_MAX_AGE_DAYS + 1)
+    with app_module.app.app_context():
+        stale = add_user(app_module, old)
+        verified = add_user(app_module, old, is_verified=True)
+        fresh = add_user(app_module, datetime.now())
+        legacy = add_user(app_module, None)
+        app_module.purge_unverified_users()
+        assert remaining(app_module, stale, verified, fresh, legacy) == {verified, fresh, legacy}
+        # A row without a timestamp gets one and waits out the full window
+        assert app_module.User.query.filter_by(email=legacy).one().created_at is not None
@@ -0,0 +1,77 @@
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def form():
+    return {'ServiceFirstnameInput': 'Ada', 'serviceLastnameInput': 'Lovelace',
+            'serviceEmailInput': f"{uuid.uuid4().hex}@example.com", 'servieTextarea': 'Hello',
+            'idempotency_key': uuid.uuid4().hex}
+
+
+def stored_calls(app_module, form):
+    with app_module.app.app_context():
+        app_module.db.session.info['use_primary'] = True
+        return app_module.ScheduledCall.query.filter_by(email=form['serviceEmailInput']).count()
+
+
+def queued_mail(app_module):
+    return sum(app_module.redis.llen(app_module.MAIL_OUTBOX_KEY + p) for p in app_module.MAIL_PRIORITIES)
+
+
+def test_repeated_submission_is_handled_once(app_module, client, form):
+    first = client.post('/schedule-call', data=form)
+    second = client.post('/schedule-call', data=form)
+    assert first.status_code == second.status_code == 302
+    assert first.location == second.location
+    assert stored_calls(app_module, form) == 1
+    assert queued_mail(app_module) == 2  # the thank-you and the staff notification, once
+
+
+def test_replay_repeats_the_flash_messages(app_module, client, form):
+    client.post('/schedule-call', data=form)
+    with client.session_transaction() as session:
+        session.pop('_flashes', None)
+    client.post('/schedule-call', data=form)
+    with client.session_transaction() as session:
+        assert [category for category, _ in session['_flashes']] == ['success']
+
+
+def test_new_key_or_changed_payload_runs_again(app_module, client, form):
+    client.post('/schedule-call', data=form)
+    client.post('/schedule-call', data=dict(form, idempotency_key=uuid.uuid4().hex))
+    client.post('/schedule-call', data=dict(form, servieTextarea='Something else'))
+    assert stored_calls(app_module, form) == 3
+
+
+def test_submissions_without_a_key_are_not_deduplicated(app_module, client, form):
+    del form['idempotency_key']
+    client.post('/schedule-call', data=form)
+    client.post('/schedule-call', data=form)
+    assert stored_calls(app_module, form) == 2
+
+
+def test_failed_first_attempt_can_be_retried(app_module, client, form, monkeypatch):
+    build_body = app_module.create_client_email_body
+    calls = []
+
+    def fail_once(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise RuntimeError('boom')
+        return build_body(*args)
+
+    monkeypatch.setattr(app_module, 'create_client_email_body', fail_once)
+    assert client.post('/schedule-call', data=form).status_code == 500
+    assert client.post('/schedule-call', data=form).status_code == 302
+    assert stored_calls(app_module, form) == 2  # the first row was committed before the failure
+
+
+def test_redis_outage_skips_the_check(app_module, client, form, redis_server, monkeypatch):
+    sent = []
+    monkeypatch.setattr(app_module, 'send_email', sent.append)  # the queue is down too, so mail goes inline
+    redis_server.connected = False
+    assert client.post('/schedule-call', data=form).status_code == 302
+    assert stored_calls(app_module, form) == 1
+    assert len(sent) == 2
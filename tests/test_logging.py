@@ -0,0 +1,27 @@
+import logging
+
+import pytest
+
+
+def test_request_id_is_echoed_when_well_formed(client):
+    response = client.get('/about', headers={'X-Request-ID': 'edge-1234.a_b'})
+    assert response.headers['X-Request-ID'] == 'edge-1234.a_b'
+
+
+@pytest.mark.parametrize('incoming', [None, '', 'has space', 'x' * 65, 'new\\nline', '<script>'])
+def test_request_id_is_generated_otherwise(client, incoming):
+    headers = {} if incoming is None else {'X-Request-ID': incoming}
+    request_id = client.get('/about', headers=headers).headers['X-Request-ID']
+    assert request_id != incoming
+    assert len(request_id) == 16 and int(request_id, 16) >= 0
+
+
+def test_access_record_logs_the_route_not_the_token(app_module, client, caplog):
+    with caplog.at_level(logging.INFO, logger='access'):
+        client.get('/reset/secret-reset-token')
+        client.get('/no-such-page')
+    records = [record for record in caplog.records if record.name == 'access']
+    assert [(record.method, record.path) for record in records] == [('GET', '/reset/<token>'), ('GET', '/no-such-page')]
+    assert records[1].status == 404
+    assert all(record.duration_ms >= 0 for record in records)
+    assert 'secret-reset-token' not in caplog.text
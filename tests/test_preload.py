@@ -0,0 +1,40 @@
+from flask import template_rendered
+
+
+def links(response):
+    return response.headers.get('Link', '').split(', ')
+
+
+def preloads(response):
+    return [link for link in links(response) if 'rel=preload' in link]
+
+
+def test_pages_preload_only_the_theme_css_font_and_hero(client):
+    home = preloads(client.get('/'))
+    assert len(home) == 3
+    assert 'theme.min.css' in home[0] and home[0].endswith('as=style')
+    assert 'fonts.googleapis.com/css' in home[1]
+    assert 'agency-hero-img.jpg' in home[2] and home[2].endswith('as=image')
+    programs = preloads(client.get('/programs'))
+    assert programs[:2] == home[:2]
+    assert programs[2] != home[2]
+
+
+def test_fragments_and_scripts_get_no_hints(client):
+    client.get('/')
+    for path in ('/flashes.html', '/sw.js', '/flashes'):
+        assert 'Link' not in client.get(path).headers
+
+
+def test_cached_pages_carry_hints_without_rendering(app_module, client):
+    expected = client.get('/about').headers['Link']
+    app_module.preload_headers.clear()  # as in a worker that never rendered /about
+    rendered = []
+
+    def record(sender, template, context, **extra):
+        rendered.append(template.name)
+
+    with template_rendered.connected_to(record, app_module.app):
+        response = client.get('/about')
+    assert not rendered
+    assert response.headers['Link'] == expected
@@ -0,0 +1,5 @@
+def test_non_ascii_profile_token_is_refused_not_an_error(app_module, client, monkeypatch):
+    monkeypatch.setattr(app_module, 'PROFILE_TOKEN', 'secret')
+    response = client.get('/about', headers={'X-Profile': 'sécret'.encode().decode('latin-1')})
+    assert response.status_code == 200
+    assert 'X-Profile-File' not in response.headers
@@ -0,0 +1,91 @@
+import sqlite3
+import uuid
+
+import pytest
+from sqlalchemy import event
+
+
+@pytest.fixture
+def subscriber(app_module):
+    """A row written to the primary only; the test replica never receives it."""
+    email = f"{uuid.uuid4().hex}@example.com"
+    with app_module.app.app_context():
+        app_module.db.session.add(app_module.Subscription(email=email))
+        app_module.db.session.commit()
+    return email
+
+
+@pytest.fixture
+def replica_down(app_module):
+    attempts = []
+
+    def refuse(*args):
+        attempts.append(args)
+        raise sqlite3.OperationalError('unable to open database file')
+
+    engine = next(engine for engine, bind in app_module.replica_engines.items() if bind == 'replica0')
+    engine.dispose()
+    event.listen(engine, 'do_connect', refuse)
+    yield attempts
+    event.remove(engine, 'do_connect', refuse)
+    engine.dispose()
+
+
+def count(app_module, email):
+    return app_module.Subscription.query.filter_by(email=email).count()
+
+
+def test_reads_go_to_a_healthy_replica(app_module, subscriber):
+    with app_module.app.app_context():
+        assert count(app_module, subscriber) == 0
+        assert app_module.db.session.info['read_from_replica']
+
+
+def test_reads_after_a_write_stay_on_the_primary(app_module, subscriber):
+    with app_module.app.app_context():
+        app_module.db.session.add(app_module.Subscription(email=f"second-{subscriber}"))
+        app_module.db.session.commit()
+        assert count(app_module, subscriber) == 1
+
+
+def test_use_primary_and_pin_cookie_route_to_the_primary(app_module, subscriber):
+    with app_module.app.app_context():
+        app_module.db.session.info['use_primary'] = True
+        assert count(app_module, subscriber) == 1
+    pin = str(app_module.time.time() + 60)
+    with app_module.app.test_request_context('/', headers={'Cookie': f"{app_module.REPLICA_PIN_COOKIE}={pin}"}):
+        assert count(app_module, subscriber) == 1
+
+
+def test_unhealthy_replicas_leave_the_rotation(app_module, subscriber):
+    app_module.replica_health['replica0'] = False
+    with app_module.app.app_context():
+        assert count(app_module, subscriber) == 1
+        assert not app_module.db.session.info['read_from_replica']
+
+
+def test_failed_replica_read_is_retried_on_the_primary(app_module, subscriber, replica_down):
+    with app_module.app.app_context():
+        assert count(app_module, subscriber) == 1
+        assert app_module.db.session.info['use_primary']
+    assert replica_down
+    assert app_module.replica_health['replica0'] is False
+
+
+def test_replica_failures_never_trip_the_primary_breaker(app_module, subscriber, replica_down):
+    for _ in range(app_module.db_breaker.failure_threshold + 1):
+        app_module.replica_health['replica0'] = True
+        with app_module.app.app_context():
+            assert count(app_module, subscriber) == 1
+    assert app_module.db_breaker.state == app_module.db_breaker.CLOSED
+    assert app_module.db_breaker.failures == 0
+
+
+def test_user_lookups_fill_the_cache_from_the_primary(app_module):
+    email = f"{uuid.uuid4().hex}@example.com"
+    with app_module.app.app_context():
+        app_module.db.session.add(app_module.User(email=email, password='x', is_verified=True))
+        app_module.db.session.commit()
+    with app_module.app.test_request_context('/confirm/token'):  # no pin cookie
+        assert app_module.lookup_user(email)['is_verified'] is True
+        assert not app_module.db.session.info.get('use_primary')
@@ -0,0 +1,27 @@
+from sqlalchemy import inspect
+
+
+def index_names(app_module, table):
+    return {index['name'] for index in inspect(app_module.db.engine).get_indexes(table)}
+
+
+def test_upgrade_restores_missing_indexes(app_module):
+    with app_module.app.app_context():
+        with app_module.db.engine.begin() as connection:
+            connection.exec_driver_sql('DROP INDEX ix_contact_submission_company_name')
+        assert 'ix_contact_submission_company_name' not in index_names(app_module, 'contact_submission')
+        assert app_module.upgrade_schema() == ['ix_contact_submission_company_name']
+        assert 'ix_contact_submission_company_name' in index_names(app_module, 'contact_submission')
+        assert app_module.upgrade_schema() == []
+
+
+def test_upgrade_adds_and_backfills_user_created_at(app_module):
+    with app_module.app.app_context():
+        with app_module.db.engine.begin() as connection:
+            connection.exec_driver_sql('DROP INDEX ix_user_created_at')
+            connection.exec_driver_sql('ALTER TABLE user DROP COLUMN created_at')
+            connection.exec_driver_sql("INSERT INTO user (email, password, is_verified) VALUES ('legacy@example.com', 'x', 0)")
+        assert app_module.upgrade_schema() == ['user.created_at', 'ix_user_created_at']
+        with app_module.db.engine.connect() as connection:
+            assert connection.exec_driver_sql(
+                "SELECT created_at FROM user WHERE email = 'legacy@example.com'").scalar() is not None
@@ -0,0 +1,32 @@
+import pytest
+
+TRACE_ID = '4bf92f3577b34da6a3ce929d0e0e4736'
+PARENT_ID = '00f067aa0ba902b7'
+
+
+@pytest.mark.parametrize('header, expected', [
+    (f"00-{TRACE_ID}-{PARENT_ID}-01", (TRACE_ID, PARENT_ID, True)),
+    (f"00-{TRACE_ID}-{PARENT_ID}-00", (TRACE_ID, PARENT_ID, False)),
+    (f" 00-{TRACE_ID}-{PARENT_ID}-03 ", (TRACE_ID, PARENT_ID, True)),
+])
+def test_parse_traceparent(app_module, header, expected):
+    assert app_module.parse_traceparent(header) == expected
+
+
+@pytest.mark.parametrize('header', [
+    '',
+    '-zz',
+    f"00-{TRACE_ID.upper()}-{PARENT_ID}-01",
+    f"00-{TRACE_ID[:-1]}-{PARENT_ID}-01",
+    f"00-{TRACE_ID}-{PARENT_ID}1-01",
+    f"ff-{TRACE_ID}-{PARENT_ID}-01",
+    f"00-{'0' * 32}-{PARENT_ID}-01",
+    f"00-{TRACE_ID}-{'0' * 16}-01",
+    f"00-{TRACE_ID}-{PARENT_ID}-0g",
+])
+def test_invalid_traceparent_is_ignored(app_module, header):
+    assert app_module.parse_traceparent(header) is None
+
+
+def test_invalid_traceparent_does_not_break_the_request(client):
+    assert client.get('/about', headers={'traceparent': '00-zz-zz-zz'}).status_code == 200